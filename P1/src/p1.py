@@ -1,16 +1,22 @@
-from p1_support import load_level, show_level, save_level_costs
+from p1_grid import load_grid_level, level_from_grid, show_grid, save_grid_costs, grid_navigation_edges, \
+    grid_octile_heuristic
+from p1_jps import jump_point_search
+from p1_probe import SearchProbe
 import math
 from heapq import heappop, heappush
 import time
 
-def dijkstras_shortest_path(initial_position, destination, graph, adj):
+def dijkstras_shortest_path(initial_position, destination, graph, adj, probe=None):
     """ Searches for a minimal cost path through a graph using Dijkstra's algorithm.
 
     Args:
         initial_position: The initial cell from which the path extends.
         destination: The end location for the path.
-        graph: A loaded level, containing walls, spaces, and waypoints.
+        graph: A loaded level, containing walls, spaces, and waypoints, or a GridLevel.
         adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+            Use navigation_edges with a loaded level and grid_navigation_edges with a GridLevel, whose cells are
+            integer indices rather than (i, j) tuples.
+        probe: An optional SearchProbe that collects counters from the search.
 
     Returns:
         If a path exits, return a list containing all cells from initial_position to destination.
@@ -31,18 +37,18 @@ def dijkstras_shortest_path(initial_position, destination, graph, adj):
         #grab current cost and current node
         current_cost, current_node = heappop(queue)
 
-        # print("on node:", current_node)
-        # print("current queue", queue)
-
         if cost_so_far[current_node] < current_cost:
-            # print("duplicate")
-            # print("duplicate node:", current_node)
-            # print("cost on node:", cost_so_far[current_node])
+            if probe:
+                probe.stale()
             continue
 
+        if probe:
+            probe.expanded(current_node, current_cost)
+
         #stop if at the destination
         if current_node == destination:
-            print("total cost:", cost_so_far[current_node])
+            if probe:
+                probe.finished(current_cost)
             return reconstruct_path(came_from, initial_position, destination)
         else:
             #generate child nodes
@@ -53,13 +59,10 @@ def dijkstras_shortest_path(initial_position, destination, graph, adj):
                 if new_node not in cost_so_far or pathcost < cost_so_far[new_node]:
                     cost_so_far[new_node] = pathcost
 
-                    # print("pushing:", new_node)
-                    # print("from: ", current_node)
-                    # print("queue")
-                    # print(queue)
-
                     heappush(queue, (pathcost, new_node))
                     came_from[new_node] = current_node
+                    if probe:
+                        probe.relaxed(len(queue))
 
     return None
 
@@ -75,16 +78,268 @@ def reconstruct_path(came_from, initial_position, destination):
 
     return path
 
-def dijkstras_shortest_path_to_all(initial_position, graph, adj):
-    """ Calculates the minimum cost to every reachable cell in a graph from the initial_position.
+def a_star_shortest_path(initial_position, destination, graph, adj, heuristic, probe=None):
+    """ Searches for a minimal cost path through a graph using A*.
 
     Args:
         initial_position: The initial cell from which the path extends.
-        graph: A loaded level, containing walls, spaces, and waypoints.
+        destination: The end location for the path.
+        graph: A loaded level, containing walls, spaces, and waypoints, or a GridLevel.
         adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+        heuristic: A function of (cell, destination) returning a lower bound on the cost between them, such as
+            the one returned by octile_heuristic.
+        probe: An optional SearchProbe that collects counters from the search.
 
     Returns:
-        A dictionary, mapping destination cells to the cost of a path from the initial_position.
+        If a path exists, return a list containing all cells from initial_position to destination.
+        Otherwise, return None.
+
+    """
+
+    # priority heapqueue ordered by estimated total cost, then by cost so far
+    queue = []
+    heappush(queue, (heuristic(initial_position, destination), 0, initial_position))
+
+    came_from = dict()
+    cost_so_far = dict()
+    came_from[initial_position] = None
+    cost_so_far[initial_position] = 0
+
+    while len(queue):
+        _, current_cost, current_node = heappop(queue)
+
+        if cost_so_far[current_node] < current_cost:
+            if probe:
+                probe.stale()
+            continue
+
+        if probe:
+            probe.expanded(current_node, current_cost)
+
+        if current_node == destination:
+            if probe:
+                probe.finished(current_cost)
+            return reconstruct_path(came_from, initial_position, destination)
+
+        for new_node, new_cost in adj(graph, current_node):
+            pathcost = current_cost + new_cost
+
+            if new_node not in cost_so_far or pathcost < cost_so_far[new_node]:
+                cost_so_far[new_node] = pathcost
+                heappush(queue, (pathcost + heuristic(new_node, destination), pathcost, new_node))
+                came_from[new_node] = current_node
+                if probe:
+                    probe.relaxed(len(queue))
+
+    return None
+
+def bidirectional_shortest_path(initial_position, destination, graph, adj, probe=None):
+    """ Searches for a minimal cost path by running Dijkstra's algorithm from both ends until the searches meet.
+
+    Edge costs must be symmetric, which holds for navigation_edges and grid_navigation_edges.
+
+    Args:
+        initial_position: The initial cell from which the path extends.
+        destination: The end location for the path.
+        graph: A loaded level, containing walls, spaces, and waypoints, or a GridLevel.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+        probe: An optional SearchProbe that collects counters from the search. Its heap peak is the larger of
+            the two searches' heaps.
+
+    Returns:
+        If a path exists, return a list containing all cells from initial_position to destination.
+        Otherwise, return None.
+
+    """
+    if initial_position == destination:
+        if probe:
+            probe.finished(0)
+        return [initial_position]
+
+    # index 0 searches forward from initial_position, index 1 searches backward from destination
+    queues = ([(0, initial_position)], [(0, destination)])
+    came_froms = ({initial_position: None}, {destination: None})
+    costs_so_far = ({initial_position: 0}, {destination: 0})
+
+    best_cost = math.inf
+    meeting_node = None
+
+    while queues[0] and queues[1]:
+        # no undiscovered path can beat the best one once the two frontiers together reach its cost
+        if queues[0][0][0] + queues[1][0][0] >= best_cost:
+            break
+
+        # advance whichever frontier is closer to its origin
+        side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+        queue, came_from, cost_so_far = queues[side], came_froms[side], costs_so_far[side]
+        other_cost_so_far = costs_so_far[1 - side]
+
+        current_cost, current_node = heappop(queue)
+
+        if cost_so_far[current_node] < current_cost:
+            if probe:
+                probe.stale()
+            continue
+
+        if probe:
+            probe.expanded(current_node, current_cost)
+
+        for new_node, new_cost in adj(graph, current_node):
+            pathcost = current_cost + new_cost
+
+            if new_node not in cost_so_far or pathcost < cost_so_far[new_node]:
+                cost_so_far[new_node] = pathcost
+                heappush(queue, (pathcost, new_node))
+                came_from[new_node] = current_node
+                if probe:
+                    probe.relaxed(len(queue))
+
+                if new_node in other_cost_so_far and pathcost + other_cost_so_far[new_node] < best_cost:
+                    best_cost = pathcost + other_cost_so_far[new_node]
+                    meeting_node = new_node
+
+    if meeting_node is None:
+        return None
+
+    if probe:
+        probe.finished(best_cost)
+
+    # both halves are listed from the meeting node outward
+    forward = reconstruct_path(came_froms[0], initial_position, meeting_node)
+    backward = reconstruct_path(came_froms[1], destination, meeting_node)
+
+    return backward[::-1] + forward[1:]
+
+def dijkstras_nearest(initial_position, destinations, graph, adj, k=1, probe=None):
+    """ Finds the k destinations with the cheapest paths from initial_position, using a single search.
+
+    The search stops as soon as the k-th closest destination is settled, rather than running
+    dijkstras_shortest_path once per candidate.
+
+    Args:
+        initial_position: The initial cell from which the paths extend.
+        destinations: A collection of candidate end locations.
+        graph: A loaded level, containing walls, spaces, and waypoints, or a GridLevel.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+        k: The number of destinations to find.
+        probe: An optional SearchProbe that collects counters from the search.
+
+    Returns:
+        A list of up to k (destination, cost, path) tuples ordered by cost, where each path lists all cells from
+        initial_position to the destination in the same order as dijkstras_shortest_path. Destinations that
+        can not be reached are left out.
+
+    """
+    remaining = set(destinations)
+    found = []
+
+    queue = []
+    heappush(queue, (0, initial_position))
+
+    came_from = dict()
+    cost_so_far = dict()
+    came_from[initial_position] = None
+    cost_so_far[initial_position] = 0
+
+    while len(queue) and remaining and len(found) < k:
+        current_cost, current_node = heappop(queue)
+
+        if cost_so_far[current_node] < current_cost:
+            if probe:
+                probe.stale()
+            continue
+
+        if probe:
+            probe.expanded(current_node, current_cost)
+
+        if current_node in remaining:
+            remaining.discard(current_node)
+            found.append((current_node, current_cost,
+                          reconstruct_path(came_from, initial_position, current_node)))
+            if probe and len(found) == 1:
+                probe.finished(current_cost)
+
+        for new_node, new_cost in adj(graph, current_node):
+            pathcost = current_cost + new_cost
+
+            if new_node not in cost_so_far or pathcost < cost_so_far[new_node]:
+                cost_so_far[new_node] = pathcost
+
+                heappush(queue, (pathcost, new_node))
+                came_from[new_node] = current_node
+                if probe:
+                    probe.relaxed(len(queue))
+
+    return found
+
+def dijkstras_shortest_path_to_any(initial_position, destinations, graph, adj, probe=None):
+    """ Searches for a minimal cost path to whichever of the destinations is cheapest to reach.
+
+    Args:
+        initial_position: The initial cell from which the path extends.
+        destinations: A collection of candidate end locations, such as the cells of every health pack.
+        graph: A loaded level, containing walls, spaces, and waypoints, or a GridLevel.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+        probe: An optional SearchProbe that collects counters from the search.
+
+    Returns:
+        If any destination can be reached, return a list containing all cells from initial_position to the
+        nearest one. Otherwise, return None.
+
+    """
+    found = dijkstras_nearest(initial_position, destinations, graph, adj, 1, probe)
+    return found[0][2] if found else None
+
+def nearest_waypoints(level, src_waypoint, k=1):
+    """ Finds the k waypoints of a loaded level that are cheapest to reach from src_waypoint.
+
+    Returns:
+        A list of up to k (waypoint character, cost) tuples ordered by cost.
+
+    """
+    src = level['waypoints'][src_waypoint]
+    names = {cell: char for char, cell in level['waypoints'].items() if char != src_waypoint}
+
+    return [(names[cell], cost) for cell, cost, _ in dijkstras_nearest(src, names, level, navigation_edges, k)]
+
+def octile_heuristic(level):
+    """ Builds an admissible A* heuristic for a loaded level.
+
+    The octile distance between two cells is the cost of the shortest 8-connected route between them on open
+    floor, and scaling it by the cheapest cell cost in the level keeps it a lower bound on any real path.
+
+    Args:
+        level: A loaded level, containing walls, spaces, and waypoints.
+
+    Returns:
+        A function of (cell, destination) returning the estimated cost between the two cells.
+
+    """
+    min_cost = min(level['spaces'].values(), default=0.)
+    diagonal = (math.sqrt(2) - 2) * min_cost
+
+    def heuristic(cell, destination):
+        dx = abs(cell[0] - destination[0])
+        dy = abs(cell[1] - destination[1])
+        return min_cost * (dx + dy) + diagonal * min(dx, dy)
+
+    return heuristic
+
+def dijkstras_shortest_path_tree(initial_position, graph, adj, probe=None):
+    """ Calculates the minimum cost to every reachable cell in a graph from the initial_position, along with the
+    tree of shortest paths that reach them.
+
+    Args:
+        initial_position: The initial cell from which the path extends.
+        graph: A loaded level, containing walls, spaces, and waypoints, or a GridLevel.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+            Use navigation_edges with a loaded level and grid_navigation_edges with a GridLevel, whose cells are
+            integer indices rather than (i, j) tuples.
+        probe: An optional SearchProbe that collects counters from the search.
+
+    Returns:
+        A tuple of two dictionaries, mapping destination cells to the cost of a path from the initial_position
+        and to the previous cell on that path. reconstruct_path reads any path from the second one.
     """
 
     # priority heapqueue
@@ -101,11 +356,13 @@ def dijkstras_shortest_path_to_all(initial_position, graph, adj):
         current_cost, current_node = heappop(queue)
 
         if cost_so_far[current_node] < current_cost:
-            # print("duplicate")
-            # print("duplicate node:", current_node)
-            # print("cost on node:", cost_so_far[current_node])
+            if probe:
+                probe.stale()
             continue
 
+        if probe:
+            probe.expanded(current_node, current_cost)
+
         # generate child nodes
         for new_node, new_cost in adj(graph, current_node):
             pathcost = current_cost + new_cost
@@ -115,8 +372,78 @@ def dijkstras_shortest_path_to_all(initial_position, graph, adj):
 
                 heappush(queue, (pathcost, new_node))
                 came_from[new_node] = current_node
+                if probe:
+                    probe.relaxed(len(queue))
+
+    return cost_so_far, came_from
+
+def dijkstras_shortest_path_to_all(initial_position, graph, adj, probe=None):
+    """ Calculates the minimum cost to every reachable cell in a graph from the initial_position.
+
+    Args:
+        initial_position: The initial cell from which the path extends.
+        graph: A loaded level, containing walls, spaces, and waypoints, or a GridLevel.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+            Use navigation_edges with a loaded level and grid_navigation_edges with a GridLevel, whose cells are
+            integer indices rather than (i, j) tuples.
+        probe: An optional SearchProbe that collects counters from the search.
+
+    Returns:
+        A dictionary, mapping destination cells to the cost of a path from the initial_position.
+    """
+
+    return dijkstras_shortest_path_tree(initial_position, graph, adj, probe)[0]
+
+def dijkstras_voronoi(sources, graph, adj, probe=None):
+    """ Partitions a graph among several sources by the cheapest path from any of them, in a single search.
 
-    return cost_so_far
+    All sources are placed on the heap at once, so every cell is settled by the source nearest to it. This is
+    a geodesic Voronoi partition of the reachable cells.
+
+    Args:
+        sources: A dictionary mapping labels, such as waypoint characters, to the cells they start from.
+        graph: A loaded level, containing walls, spaces, and waypoints, or a GridLevel.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+        probe: An optional SearchProbe that collects counters from the search.
+
+    Returns:
+        A tuple of two dictionaries, mapping each reachable cell to the label of its nearest source and to the
+        cost of the path from that source.
+
+    """
+    queue = []
+    owner = dict()
+    cost_so_far = dict()
+
+    for label, cell in sources.items():
+        if cell not in cost_so_far:
+            owner[cell] = label
+            cost_so_far[cell] = 0
+            heappush(queue, (0, cell))
+
+    while len(queue):
+        current_cost, current_node = heappop(queue)
+
+        if cost_so_far[current_node] < current_cost:
+            if probe:
+                probe.stale()
+            continue
+
+        if probe:
+            probe.expanded(current_node, current_cost)
+
+        for new_node, new_cost in adj(graph, current_node):
+            pathcost = current_cost + new_cost
+
+            if new_node not in cost_so_far or pathcost < cost_so_far[new_node]:
+                cost_so_far[new_node] = pathcost
+                owner[new_node] = owner[current_node]
+
+                heappush(queue, (pathcost, new_node))
+                if probe:
+                    probe.relaxed(len(queue))
+
+    return owner, cost_so_far
 
 def navigation_edges(level, cell):
     """ Provides a list of adjacent cells and their respective costs from the given cell.
@@ -138,17 +465,11 @@ def navigation_edges(level, cell):
 
     adj_nodes = []
 
-    #print("checking adj nodes for")
-    #print(cell)
-
     for i in range(-1, 2):
         for j in range(-1, 2):
             new_cell = (cell[0]+i, cell[1]+j)
-            #print("this is the new cell we be checking")
-            #print(new_cell)
             #if not a wall and not the original cell
             if new_cell != cell and new_cell not in level["walls"]:
-                #print("not a wall")
                 #check if straight or diagonal and calculate distance
                 if abs(i + j) == 1:
                     distance = 0.5 * level["spaces"][cell] + 0.5 * level["spaces"][new_cell]
@@ -158,37 +479,79 @@ def navigation_edges(level, cell):
                 new_tuple = (new_cell, distance)
                 adj_nodes.append(new_tuple)
 
-    #print("printing adj nodes")
-    #print(adj_nodes)
-
     return adj_nodes
 
-def test_route(filename, src_waypoint, dst_waypoint):
+def test_route(filename, src_waypoint, dst_waypoint, search='dijkstra', probe=None, cache=None):
     """ Loads a level, searches for a path between the given waypoints, and displays the result.
 
     Args:
         filename: The name of the text file containing the level.
         src_waypoint: The character associated with the initial waypoint.
         dst_waypoint: The character associated with the destination waypoint.
+        search: The search to run, one of 'dijkstra', 'astar', 'bidirectional', 'jps', 'alt', or 'hpa'. The
+            'alt' search loads the landmark index stored next to the level file, building it on first use, and
+            the near-optimal 'hpa' search routes over 10x10 cell clusters before refining the path.
+        probe: An optional SearchProbe to collect counters from the search. The total cost of the path is printed
+            from it for every search but 'hpa'.
+        cache: An optional PathCache. When given, the path is answered from it, searching with Dijkstra's
+            algorithm only if the cache has no result for this level and route, so search must be 'dijkstra'.
+            The level is loaded afresh on every call, so cached results are reused exactly while the file's walls
+            and costs are unchanged. Levels edited in memory are only noticed automatically through
+            GridLevel.set_cell or set_level_cell (see PathCache).
 
     """
-
-    # Load and display the level.
-    level = load_level(filename)
-    show_level(level)
-
-    # Retrieve the source and destination coordinates from the level.
-    src = level['waypoints'][src_waypoint]
-    dst = level['waypoints'][dst_waypoint]
+    if cache is not None and search != 'dijkstra':
+        raise ValueError("A PathCache only answers with Dijkstra's algorithm, not %s" % search)
+    probe = probe if probe is not None else SearchProbe()
+
+    # Load and display the level, once, in its array-backed form.
+    grid = load_grid_level(filename)
+    show_grid(grid)
+
+    # Retrieve the source and destination cells from the level.
+    src = grid.waypoints[src_waypoint]
+    dst = grid.waypoints[dst_waypoint]
+
+    if search == 'hpa':
+        from p1_hpa import build_cluster_graph, hpa_shortest_path
+
+        # the cluster graph is built over the dictionary form of the level, so only this search converts it
+        level = level_from_grid(grid)
+        path = hpa_shortest_path(grid.position(src), grid.position(dst), level, build_cluster_graph(level))
+        if path:
+            if probe.cost is not None:
+                print("total cost:", probe.cost)
+            show_grid(grid, [grid.index(cell) for cell in path])
+        else:
+            print("No path possible!")
+        return
 
     # Search for and display the path from src to dst.
-    path = dijkstras_shortest_path(src, dst, level, navigation_edges)
+    if cache is not None:
+        path = cache.path(grid, src, dst, probe)
+    elif search == 'dijkstra':
+        path = dijkstras_shortest_path(src, dst, grid, grid_navigation_edges, probe)
+    elif search == 'astar':
+        path = a_star_shortest_path(src, dst, grid, grid_navigation_edges, grid_octile_heuristic(grid), probe)
+    elif search == 'bidirectional':
+        path = bidirectional_shortest_path(src, dst, grid, grid_navigation_edges, probe)
+    elif search == 'jps':
+        path = jump_point_search(src, dst, grid, probe=probe)
+    elif search == 'alt':
+        from p1_landmarks import load_landmark_index, alt_heuristic
+
+        heuristic = alt_heuristic(load_landmark_index(filename))
+        path = a_star_shortest_path(src, dst, grid, grid_navigation_edges, heuristic, probe)
+    else:
+        raise ValueError("Unknown search: %s" % search)
     if path:
-        show_level(level, path)
+        if probe.cost is not None:
+            print("total cost:", probe.cost)
+        show_grid(grid, path)
     else:
         print("No path possible!")
 
-def cost_to_all_cells(filename, src_waypoint, output_filename):
+def cost_to_all_cells(filename, src_waypoint, output_filename, engine='dijkstra'):
     """ Loads a level, calculates the cost to all reachable cells from
     src_waypoint, then saves the result in a csv file with name output_filename.
 
@@ -196,19 +559,48 @@ def cost_to_all_cells(filename, src_waypoint, output_filename):
         filename: The name of the text file containing the level.
         src_waypoint: The character associated with the initial waypoint.
         output_filename: The filename for the output csv file.
+        engine: 'dijkstra' for the heap search, or 'wavefront' for the vectorized relaxation, which needs NumPy.
 
     """
 
     # Load and display the level.
-    level = load_level(filename)
-    show_level(level)
+    grid = load_grid_level(filename)
+    show_grid(grid)
 
-    # Retrieve the source coordinates from the level.
-    src = level['waypoints'][src_waypoint]
+    # Retrieve the source cell from the level.
+    src = grid.waypoints[src_waypoint]
+
+    # Calculate the cost to all reachable cells from src and stream them to a csv file.
+    if engine == 'dijkstra':
+        costs_to_all_cells = dijkstras_shortest_path_to_all(src, grid, grid_navigation_edges)
+    elif engine == 'wavefront':
+        from p1_wavefront import wavefront_cost_field
+
+        costs_to_all_cells = wavefront_cost_field(grid, src)
+    else:
+        raise ValueError("Unknown engine: %s" % engine)
+    save_grid_costs(grid, costs_to_all_cells, output_filename)
+
+def waypoint_territories(filename, output_filename, costs_filename=None):
+    """ Loads a level, assigns every reachable cell to its nearest waypoint, then saves the labels in a csv
+    file with name output_filename.
 
-    # Calculate the cost to all reachable cells from src and save to a csv file.
-    costs_to_all_cells = dijkstras_shortest_path_to_all(src, level, navigation_edges)
-    save_level_costs(level, costs_to_all_cells, output_filename)
+    Args:
+        filename: The name of the text file containing the level.
+        output_filename: The filename for the output csv file of waypoint labels, blank where unreachable.
+        costs_filename: If provided, the filename for a csv file of the cost from each cell's nearest waypoint.
+
+    """
+
+    # Load and display the level.
+    grid = load_grid_level(filename)
+    show_grid(grid)
+
+    # Run one search from every waypoint at once and save the labels, and optionally the costs.
+    owners, costs = dijkstras_voronoi(grid.waypoints, grid, grid_navigation_edges)
+    save_grid_costs(grid, owners, output_filename, missing='')
+    if costs_filename:
+        save_grid_costs(grid, costs, costs_filename)
 
 if __name__ == '__main__':
     total_start = time.perf_counter()
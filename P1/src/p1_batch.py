@@ -0,0 +1,177 @@
+# Batch cost tables over GridLevels for P1
+
+from array import array
+from heapq import heappop, heappush
+from math import inf
+from multiprocessing import Pool
+
+
+class SearchWorkspace:
+    def __init__(self, grid):
+        """ Preallocates the distance and parent buffers used to run Dijkstra's algorithm over a GridLevel.
+
+        The buffers are sized to the grid once and reused by every call to run, which only resets the cells the
+        previous run reached instead of allocating fresh dictionaries.
+
+        Args:
+            grid: The GridLevel to search.
+
+        """
+        self.grid = grid
+        self.dist = array('d', [inf]) * grid.size      # Cell index -> cost from the last source, inf if unreached
+        self.parent = array('l', [-1]) * grid.size     # Cell index -> previous cell on the path, -1 if none
+        self.touched = []                               # Cells reached by the last run
+        self.queue = []                                 # Heap reused across runs
+        self.source = None                              # Source of the last run
+
+    def run(self, source, targets=None, probe=None):
+        """ Calculates the minimum cost from source to every reachable cell, filling dist and parent.
+
+        Args:
+            source: The index of the cell from which paths extend.
+            targets: If provided, a collection of cell indices; the search stops once all of them are settled,
+                leaving the costs of farther cells unfinished.
+            probe: An optional SearchProbe that collects counters from the search.
+
+        Returns:
+            The dist buffer, mapping cell indices to costs from source. It is overwritten by the next run.
+
+        """
+        grid = self.grid
+        walls, costs, offsets = grid.walls, grid.costs, grid.offsets
+        dist, parent = self.dist, self.parent
+
+        for index in self.touched:
+            dist[index] = inf
+            parent[index] = -1
+
+        touched = self.touched = [source]
+        queue = self.queue
+        del queue[:]
+
+        remaining = set(targets) if targets is not None else None
+        self.source = source
+        dist[source] = 0
+        heappush(queue, (0, source))
+
+        while queue:
+            current_cost, current_node = heappop(queue)
+
+            if dist[current_node] < current_cost:
+                if probe:
+                    probe.stale()
+                continue
+
+            if probe:
+                probe.expanded(current_node, current_cost)
+
+            if remaining is not None:
+                remaining.discard(current_node)
+                if not remaining:
+                    break
+
+            half = 0.5 * costs[current_node]
+            for offset, scale in offsets:
+                new_node = current_node + offset
+                if walls[new_node]:
+                    continue
+
+                pathcost = current_cost + scale * (half + 0.5 * costs[new_node])
+                if pathcost < dist[new_node]:
+                    if dist[new_node] == inf:
+                        touched.append(new_node)
+                    dist[new_node] = pathcost
+                    parent[new_node] = current_node
+                    heappush(queue, (pathcost, new_node))
+                    if probe:
+                        probe.relaxed(len(queue))
+
+        return dist
+
+    def path_to(self, destination):
+        """ Returns the path from the last run's source to destination, destination first, or None if unreached. """
+        if self.dist[destination] == inf:
+            return None
+
+        path = [destination]
+        while path[-1] != self.source:
+            path.append(self.parent[path[-1]])
+
+        return path
+
+
+def cost_fields(grid, sources, processes=None):
+    """ Calculates one full cost field per source cell.
+
+    Args:
+        grid: A GridLevel.
+        sources: A list of source cell indices.
+        processes: If provided, the number of worker processes to spread the sources over.
+
+    Returns:
+        A list with one array per source, mapping cell indices to costs, with inf for unreachable cells.
+
+    """
+    if processes:
+        with Pool(processes, _init_worker, (grid,)) as pool:
+            return pool.map(_worker_field, sources)
+
+    workspace = SearchWorkspace(grid)
+    return [array('d', workspace.run(source)) for source in sources]
+
+
+def cost_table(grid, sources, targets=None, processes=None):
+    """ Calculates a dense matrix of minimum path costs between cells, such as all pairs of waypoints.
+
+    Args:
+        grid: A GridLevel.
+        sources: A list of source cell indices.
+        targets: A list of destination cell indices, defaulting to sources.
+        processes: If provided, the number of worker processes to spread the sources over.
+
+    Returns:
+        A list of rows, one per source, holding the cost to each target in order, with inf where unreachable.
+
+    """
+    if targets is None:
+        targets = sources
+
+    if processes:
+        with Pool(processes, _init_worker, (grid,)) as pool:
+            return pool.starmap(_worker_row, [(source, targets) for source in sources])
+
+    workspace = SearchWorkspace(grid)
+    return [_table_row(workspace, source, targets) for source in sources]
+
+
+def waypoint_cost_table(grid, processes=None):
+    """ Calculates the cost between every pair of waypoints in a GridLevel.
+
+    Returns:
+        A tuple of the sorted waypoint characters and the cost table, indexed in that order.
+
+    """
+    names = sorted(grid.waypoints)
+    cells = [grid.waypoints[name] for name in names]
+    return names, cost_table(grid, cells, processes=processes)
+
+
+def _table_row(workspace, source, targets):
+    dist = workspace.run(source, targets)
+    return [dist[target] for target in targets]
+
+
+_workspace = None
+
+
+def _init_worker(grid):
+    global _workspace
+    _workspace = SearchWorkspace(grid)
+
+
+def _worker_field(source):
+    return array('d', _workspace.run(source))
+
+
+def _worker_row(source, targets):
+    return _table_row(_workspace, source, targets)
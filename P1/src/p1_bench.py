@@ -0,0 +1,266 @@
+# Benchmark harness and synthetic maze generator for the P1 search engines
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import time
+import tracemalloc
+from heapq import heappop, heappush
+
+import p1
+import p1_batch
+import p1_jps
+from p1 import a_star_shortest_path, bidirectional_shortest_path, dijkstras_shortest_path, \
+    dijkstras_shortest_path_to_all
+from p1_batch import SearchWorkspace
+from p1_grid import grid_navigation_edges, grid_octile_heuristic, load_grid_level, level_from_grid
+from p1_hpa import build_cluster_graph, hpa_shortest_path
+from p1_jps import jump_point_mask, jump_point_search
+from p1_landmarks import alt_heuristic, build_landmark_index
+from p1_probe import SearchProbe
+
+# Modules whose heap operations are counted while an engine runs
+HEAP_MODULES = (p1, p1_batch, p1_jps)
+
+
+def generate_maze(width, height, wall_density=0.2, costs=None, waypoints='abcdefgh', seed=None):
+    """ Generates the text of a random P1 level.
+
+    The level is bordered by walls, each inner cell is a wall with probability wall_density, and open cells
+    draw their cost from the given distribution. Waypoints are placed on distinct open cells.
+
+    Args:
+        width: The number of columns in the level.
+        height: The number of rows in the level.
+        wall_density: The probability of an inner cell being a wall.
+        costs: A dictionary mapping cell costs (1 to 9) to their relative weights, defaulting to all cost 1.
+        waypoints: The waypoint characters to place.
+        seed: The seed for the random generator, so that a maze can be regenerated exactly.
+
+    Returns:
+        The level as a string, in the format read by load_level.
+
+    """
+    rng = random.Random(seed)
+    costs = costs or {1: 1}
+    chars = [str(int(cost)) for cost in costs]
+    weights = list(costs.values())
+
+    rows = []
+    for j in range(height):
+        if j in (0, height - 1):
+            rows.append(['X'] * width)
+            continue
+
+        row = ['X']
+        for i in range(1, width - 1):
+            row.append('X' if rng.random() < wall_density else rng.choices(chars, weights)[0])
+        row.append('X')
+        rows.append(row)
+
+    open_cells = [(i, j) for j, row in enumerate(rows) for i, char in enumerate(row) if char != 'X']
+    for char, (i, j) in zip(waypoints, rng.sample(open_cells, min(len(waypoints), len(open_cells)))):
+        rows[j][i] = char
+
+    return ''.join(''.join(row) + '\n' for row in rows)
+
+
+def write_maze(filename, width, height, wall_density=0.2, costs=None, waypoints='abcdefgh', seed=None):
+    """ Generates a random level with generate_maze and saves it to filename. """
+    with open(filename, 'w') as f:
+        f.write(generate_maze(width, height, wall_density, costs, waypoints, seed))
+
+    return filename
+
+
+def route_engines(level, grid):
+    """ Prepares every point-to-point search over a level.
+
+    Args:
+        level: The loaded level.
+        grid: The same level as a GridLevel.
+
+    Returns:
+        A list of (name, preparation seconds, search) tuples, where search takes the source and destination
+        waypoint characters and a SearchProbe, and returns a path. The 'hpa' search ignores the probe.
+
+    """
+    engines = []
+
+    def prepared(name, prepare, search):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            context = prepare()
+        engines.append((name, time.perf_counter() - start, lambda src, dst, probe: search(context, src, dst, probe)))
+
+    def cell(char):
+        return grid.waypoints[char]
+
+    def position(char):
+        return level['waypoints'][char]
+
+    prepared('dijkstra', lambda: None,
+             lambda _, src, dst, probe:
+             dijkstras_shortest_path(cell(src), cell(dst), grid, grid_navigation_edges, probe))
+    prepared('astar', lambda: grid_octile_heuristic(grid),
+             lambda h, src, dst, probe:
+             a_star_shortest_path(cell(src), cell(dst), grid, grid_navigation_edges, h, probe))
+    prepared('bidirectional', lambda: None,
+             lambda _, src, dst, probe:
+             bidirectional_shortest_path(cell(src), cell(dst), grid, grid_navigation_edges, probe))
+    prepared('jps', lambda: (jump_point_mask(grid), grid_octile_heuristic(grid)),
+             lambda c, src, dst, probe: jump_point_search(cell(src), cell(dst), grid, *c, probe=probe))
+    prepared('workspace', lambda: SearchWorkspace(grid),
+             lambda w, src, dst, probe: (w.run(cell(src), [cell(dst)], probe), w.path_to(cell(dst)))[1])
+    prepared('alt', lambda: alt_heuristic(build_landmark_index(grid)),
+             lambda h, src, dst, probe:
+             a_star_shortest_path(cell(src), cell(dst), grid, grid_navigation_edges, h, probe))
+    prepared('hpa', lambda: build_cluster_graph(level),
+             lambda g, src, dst, probe: hpa_shortest_path(position(src), position(dst), level, g))
+
+    return engines
+
+
+def field_engines(level, grid):
+    """ Returns (name, search) pairs for every all-cells search.
+
+    Each search takes a source waypoint and a SearchProbe. The 'wavefront' search ignores the probe.
+
+    """
+    engines = [('dijkstra_to_all', lambda src, probe:
+                dijkstras_shortest_path_to_all(grid.waypoints[src], grid, grid_navigation_edges, probe)),
+               ('workspace_to_all', lambda src, probe: SearchWorkspace(grid).run(grid.waypoints[src], None, probe))]
+
+    try:
+        from p1_wavefront import wavefront_cost_field
+    except ImportError:
+        return engines
+
+    engines.append(('wavefront', lambda src, probe: wavefront_cost_field(grid, grid.waypoints[src])))
+    return engines
+
+
+@contextlib.contextmanager
+def count_heap_operations(counts):
+    """ Counts the heap pushes and pops made by the search modules while the block runs. """
+    def counted_push(queue, item):
+        counts['pushes'] += 1
+        heappush(queue, item)
+
+    def counted_pop(queue):
+        counts['pops'] += 1
+        return heappop(queue)
+
+    for module in HEAP_MODULES:
+        module.heappush, module.heappop = counted_push, counted_pop
+    try:
+        yield counts
+    finally:
+        for module in HEAP_MODULES:
+            module.heappush, module.heappop = heappush, heappop
+
+
+def measure(search, *args):
+    """ Runs search(*args, probe) three times: for wall time, for search counters, and for peak memory.
+
+    Only the counting run is given a SearchProbe. Heap pushes and pops are also counted directly, which covers
+    the searches that do not take a probe.
+
+    Returns:
+        A dictionary of the wall time (s), probe counters, heap pushes and pops, and peak traced memory (bytes).
+
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        search(*args, None)
+        seconds = time.perf_counter() - start
+
+        probe = SearchProbe()
+        with count_heap_operations({'pushes': 0, 'pops': 0}) as counts:
+            search(*args, probe)
+
+        tracemalloc.start()
+        search(*args, None)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return dict(probe.counters(), **counts, seconds=seconds, peak_bytes=peak)
+
+
+def run_benchmark(filename, pairs):
+    """ Runs every search engine on a level and yields one result row per engine and query.
+
+    Args:
+        filename: The name of the text file containing the level.
+        pairs: A list of (source, destination) waypoint characters. A destination of None runs the all-cells
+            engines from the source.
+
+    """
+    grid = load_grid_level(filename)
+    level = level_from_grid(grid)
+
+    for name, prepare_seconds, search in route_engines(level, grid):
+        for src, dst in pairs:
+            if dst is not None:
+                yield dict(measure(search, src, dst), engine=name, query='%s->%s' % (src, dst),
+                           prepare_seconds=prepare_seconds)
+
+    for name, search in field_engines(level, grid):
+        for src, dst in pairs:
+            if dst is None:
+                yield dict(measure(search, src), engine=name, query='%s->*' % src, prepare_seconds=0.)
+
+
+COLUMNS = ('engine', 'query', 'seconds', 'prepare_seconds', 'expansions', 'stale_pops', 'relaxations',
+           'heap_peak', 'pushes', 'pops', 'peak_bytes')
+
+
+def print_row(row):
+    print('%-18s %-8s %10.4f %10.4f %10d %10d %11d %10d %10d %10d %12d' % tuple(row[column] for column in COLUMNS))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the P1 search engines on generated mazes.')
+    parser.add_argument('--width', type=int, default=200)
+    parser.add_argument('--height', type=int, default=200)
+    parser.add_argument('--walls', type=float, default=0.2, help='probability of an inner cell being a wall')
+    parser.add_argument('--costs', default='1:1', help='cost distribution as cost:weight pairs, e.g. 1:8,5:2')
+    parser.add_argument('--waypoints', type=int, default=4, help='number of waypoints to place (at most 8)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--level', help='benchmark this level file instead of generating one')
+    parser.add_argument('--output', default='bench_maze.txt', help='where to write the generated level')
+    parser.add_argument('--csv', help='also write the results to this csv file')
+    args = parser.parse_args()
+
+    if args.level:
+        level_filename = args.level
+        chars = sorted(load_grid_level(level_filename).waypoints)
+    else:
+        distribution = {int(cost): float(weight) for cost, weight in
+                        (pair.split(':') for pair in args.costs.split(','))}
+        chars = 'abcdefgh'[:args.waypoints]
+        level_filename = write_maze(args.output, args.width, args.height, args.walls, distribution, chars,
+                                    args.seed)
+
+    # consecutive waypoint pairs for routing, and the first waypoint for the all-cells engines
+    queries = list(zip(chars, chars[1:])) + [(chars[0], None)]
+
+    print('%-18s %-8s %10s %10s %10s %10s %11s %10s %10s %10s %12s' % COLUMNS)
+    results = []
+    for result in run_benchmark(level_filename, queries):
+        print_row(result)
+        results.append(result)
+
+    if args.csv:
+        from csv import DictWriter
+
+        with open(args.csv, 'w', newline='') as f:
+            csv_writer = DictWriter(f, COLUMNS, extrasaction='ignore')
+            csv_writer.writeheader()
+            csv_writer.writerows(results)
+        print("Saved file:", args.csv)
+
+    if not args.level and os.path.exists(args.output):
+        print("Level kept at:", args.output)
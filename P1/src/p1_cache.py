@@ -0,0 +1,171 @@
+# Path and cost-field cache for P1, keyed by level content
+
+import hashlib
+from collections import OrderedDict
+from weakref import WeakKeyDictionary
+
+from p1 import dijkstras_shortest_path, dijkstras_shortest_path_tree, navigation_edges, reconstruct_path
+from p1_grid import GridLevel, grid_navigation_edges
+from p1_probe import SearchProbe
+
+# Number of loaded levels whose digests a PathCache remembers. They are held strongly, so this stays small.
+DIGESTED_LEVELS = 4
+
+
+def level_digest(level):
+    """ Returns a BLAKE2 digest of the walls and cell costs of a loaded level or a GridLevel.
+
+    Two levels with the same digest have the same walls and costs, short of a 128-bit collision. Computing it
+    reads the whole level, so PathCache only does so once per level object and version.
+
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(level, GridLevel):
+        digest.update(b'%d,%d;' % (level.width, level.height))
+        digest.update(level.walls)
+        digest.update(level.costs.tobytes())
+    else:
+        digest.update(repr(sorted(level['walls'])).encode())
+        digest.update(repr(sorted(level['spaces'].items())).encode())
+    return digest.digest()
+
+
+class PathCache:
+    def __init__(self, max_paths=1024, max_fields=16, adj=None):
+        """ Initializes an LRU cache of paths and of cost fields, each bounded to a number of entries.
+
+        Entries are keyed by the level's digest, so levels loaded again from the same file share entries, and a
+        query on a level whose walls or costs have changed never sees a result computed before the change. The
+        digest is computed once per level object and version, and recomputed only after an edit. Edits are
+        counted in the version when made through GridLevel.set_cell or p1_support.set_level_cell. Any other edit,
+        such as writing to a GridLevel's walls or costs arrays, goes unnoticed until invalidate(level) is called.
+        When a level's digest changes, the entries for its old digest are dropped at once instead of waiting to
+        be evicted.
+
+        The cache holds GridLevels only weakly. Loaded levels are dictionaries, which cannot be weakly
+        referenced, so the digests of only the last DIGESTED_LEVELS of them are kept.
+
+        Args:
+            max_paths:  The number of (source, destination) paths to keep.
+            max_fields: The number of per-source cost fields to keep. Each one holds a cost and a parent per
+                        reachable cell, so this bounds most of the cache's memory.
+            adj:        The adjacency function to search with. By default it is grid_navigation_edges for
+                        GridLevels and navigation_edges for loaded levels.
+
+        """
+        self.max_paths = max_paths
+        self.max_fields = max_fields
+        self.adj = adj
+
+        self.paths = OrderedDict()      # (digest, src, dst) -> (path or None, cost), least recently used first
+        self.fields = OrderedDict()     # (digest, src) -> (cost_so_far, came_from), least recently used first
+        self.grids = WeakKeyDictionary()    # GridLevel -> (its version, its digest)
+        self.levels = OrderedDict()     # id of a loaded level -> (level, its version, its digest), oldest first
+
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, level):
+        """ Marks the digest of level as stale. Call it after editing the level other than through set_cell. """
+        if isinstance(level, GridLevel):
+            if level in self.grids:
+                self.grids[level] = (None, self.grids[level][1])
+        elif id(level) in self.levels:
+            self.levels[id(level)] = (level, None, self.levels[id(level)][2])
+
+    def _digest(self, level):
+        if isinstance(level, GridLevel):
+            version = level.version
+            known = self.grids.get(level)
+        else:
+            # the level itself is held in self.levels so that its id cannot be reused by another object
+            version = level.get('version', 0)
+            known = self.levels.get(id(level))
+            known = known and known[1:]
+
+        if known is not None and known[0] == version:
+            if not isinstance(level, GridLevel):
+                self.levels.move_to_end(id(level))
+            return known[1]
+
+        digest = level_digest(level)
+        if known is not None and known[1] != digest:
+            for key in [key for key in self.paths if key[0] == known[1]]:
+                del self.paths[key]
+            for key in [key for key in self.fields if key[0] == known[1]]:
+                del self.fields[key]
+
+        if isinstance(level, GridLevel):
+            self.grids[level] = (version, digest)
+        else:
+            self.levels[id(level)] = (level, version, digest)
+            self.levels.move_to_end(id(level))
+            if len(self.levels) > DIGESTED_LEVELS:
+                self.levels.popitem(last=False)
+        return digest
+
+    def _adj(self, level):
+        if self.adj is not None:
+            return self.adj
+        return grid_navigation_edges if isinstance(level, GridLevel) else navigation_edges
+
+    def path(self, level, src, dst, probe=None):
+        """ Returns the shortest path from src to dst, like dijkstras_shortest_path, reusing cached results.
+
+        A cached cost field from src answers the query without a search, since its shortest-path tree reaches
+        every destination. The probe, if given, collects counters only when a search runs, but is always
+        given the cost of the path.
+
+        """
+        digest = self._digest(level)
+
+        key = (digest, src, dst)
+        if key in self.paths:
+            self.paths.move_to_end(key)
+            self.hits += 1
+            path, cost = self.paths[key]
+            if probe and cost is not None:
+                probe.finished(cost)
+            return path
+
+        field = self.fields.get((digest, src))
+        if field is not None:
+            self.fields.move_to_end((digest, src))
+            self.hits += 1
+            cost_so_far, came_from = field
+            path = reconstruct_path(came_from, src, dst) if dst in cost_so_far else None
+            cost = cost_so_far.get(dst)
+            if probe and cost is not None:
+                probe.finished(cost)
+        else:
+            self.misses += 1
+            probe = probe if probe is not None else SearchProbe()
+            path = dijkstras_shortest_path(src, dst, level, self._adj(level), probe)
+            cost = probe.cost if path else None
+
+        self.paths[key] = (path, cost)
+        if len(self.paths) > self.max_paths:
+            self.paths.popitem(last=False)
+
+        return path
+
+    def cost_field(self, level, src):
+        """ Returns the cost to every reachable cell from src, like dijkstras_shortest_path_to_all.
+
+        The returned dictionary is shared with the cache and must not be modified.
+
+        """
+        digest = self._digest(level)
+
+        key = (digest, src)
+        if key in self.fields:
+            self.fields.move_to_end(key)
+            self.hits += 1
+            return self.fields[key][0]
+
+        self.misses += 1
+        self.fields[key] = dijkstras_shortest_path_tree(src, level, self._adj(level))
+        if len(self.fields) > self.max_fields:
+            self.fields.popitem(last=False)
+
+        return self.fields[key][0]
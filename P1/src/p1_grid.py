@@ -0,0 +1,341 @@
+# Compact, array-backed level representation for P1
+
+from array import array
+from csv import writer
+from math import inf, sqrt
+import mmap
+import re
+import sys
+
+SQRT2 = sqrt(2)
+
+# Byte translation tables from level characters to wall flags and to cell costs
+_OPEN = b'0123456789' + bytes(range(ord('a'), ord('z') + 1))
+_WALL_TABLE = bytes(0 if byte in _OPEN else 1 for byte in range(256))
+_COST_TABLE = bytes(byte - ord('0') if chr(byte).isdigit() else 1 if byte in _OPEN else 0 for byte in range(256))
+_WAYPOINT = re.compile(rb'[a-z]')
+
+
+class GridLevel:
+    def __init__(self, width, height):
+        """ Initializes an empty grid level in which every cell is a wall.
+
+        The grid is stored row-major in flat buffers padded by a one cell wall border, so the eight neighbors
+        of any interior cell are always valid indices and never need bounds checks. Cells are addressed by
+        integer indices into those buffers rather than by (i, j) tuples.
+
+        Args:
+            width:  The number of columns in the level.
+            height: The number of rows in the level.
+
+        """
+        self.width = width                              # Columns in the level, excluding the border
+        self.height = height                            # Rows in the level, excluding the border
+        self.stride = width + 2                         # Distance between vertically adjacent indices
+        self.size = self.stride * (height + 2)          # Number of cells in the padded buffers
+
+        self.costs = array('d', bytes(8 * self.size))   # Cell index -> cost of the cell
+        self.walls = bytearray(b'\x01') * self.size     # Cell index -> 1 if the cell can not be entered
+        self.waypoints = {}                             # Waypoint character -> cell index
+        self.version = 0                                # Bumped by every set_cell, so caches can tell edits
+
+        s = self.stride
+        self.offsets = ((-s - 1, SQRT2), (-s, 1.), (-s + 1, SQRT2),
+                        (-1, 1.), (1, 1.),
+                        (s - 1, SQRT2), (s, 1.), (s + 1, SQRT2))
+
+    def index(self, cell):
+        """ Converts an (i, j) cell into its index in the flat buffers. """
+        return (cell[1] + 1) * self.stride + cell[0] + 1
+
+    def position(self, index):
+        """ Converts an index in the flat buffers into its (i, j) cell. """
+        j, i = divmod(index, self.stride)
+        return i - 1, j - 1
+
+    def cells(self):
+        """ Yields the index of every cell that can be entered. """
+        walls = self.walls
+        for index in range(self.size):
+            if not walls[index]:
+                yield index
+
+    def min_cost(self):
+        """ Returns the smallest cost of any enterable cell, or 0 if there are none. """
+        return min((self.costs[index] for index in self.cells()), default=0.)
+
+    def set_cell(self, cell, cost):
+        """ Marks a cell as open space with the given cost, or as a wall if cost is None. """
+        index = self.index(cell)
+        self.version += 1
+        if cost is None:
+            self.walls[index] = 1
+            self.costs[index] = 0.
+        else:
+            self.walls[index] = 0
+            self.costs[index] = cost
+
+
+def load_grid_level(filename):
+    """ Loads a level from a given text file into a GridLevel.
+
+    Args:
+        filename: The name of the txt file containing the maze.
+
+    Returns:
+        The loaded GridLevel. Any character that load_level would not record as a space is stored as a wall.
+
+    """
+    with open(filename, "r") as f:
+        lines = [line.rstrip('\n') for line in f]
+
+    grid = GridLevel(max((len(line) for line in lines), default=0), len(lines))
+    for j, line in enumerate(lines):
+        row = grid.index((0, j))
+        for i, char in enumerate(line):
+            if char.isnumeric():
+                grid.walls[row + i] = 0
+                grid.costs[row + i] = float(char)
+            elif char.islower():
+                grid.walls[row + i] = 0
+                grid.costs[row + i] = 1.
+                grid.waypoints[char] = row + i
+
+    return grid
+
+
+def load_grid_level_mmap(filename):
+    """ Loads a level from a given text file into a GridLevel by memory-mapping it.
+
+    Each row of the file is translated into wall flags and costs in bulk, so no Python object is created per
+    cell. Only ASCII digits and lowercase waypoint letters are treated as open space.
+
+    Args:
+        filename: The name of the txt file containing the maze.
+
+    Returns:
+        The loaded GridLevel.
+
+    """
+    with open(filename, 'rb') as f:
+        if not f.seek(0, 2):
+            return GridLevel(0, 0)
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as text:
+            rows = []
+            start = 0
+            while start < len(text):
+                end = text.find(b'\n', start)
+                if end < 0:
+                    end = len(text)
+                rows.append((start, end - 1 if end > start and text[end - 1] == ord('\r') else end))
+                start = end + 1
+
+            grid = GridLevel(max(end - start for start, end in rows), len(rows))
+            for j, (start, end) in enumerate(rows):
+                row = text[start:end]
+                index = grid.index((0, j))
+                grid.walls[index:index + len(row)] = row.translate(_WALL_TABLE)
+                grid.costs[index:index + len(row)] = array('d', array('B', row.translate(_COST_TABLE)))
+                for match in _WAYPOINT.finditer(row):
+                    grid.waypoints[chr(row[match.start()])] = index + match.start()
+
+    return grid
+
+
+def grid_from_level(level):
+    """ Converts a level returned by load_level into a GridLevel.
+
+    Args:
+        level: A loaded level, containing walls, spaces, and waypoints.
+
+    Returns:
+        The equivalent GridLevel, with the level shifted so its top left cell is (0, 0).
+
+    """
+    xs, ys = zip(*(list(level['spaces'].keys()) + list(level['walls'])))
+    x_lo, y_lo = min(xs), min(ys)
+
+    grid = GridLevel(max(xs) - x_lo + 1, max(ys) - y_lo + 1)
+    for (i, j), cost in level['spaces'].items():
+        grid.set_cell((i - x_lo, j - y_lo), cost)
+    for char, (i, j) in level['waypoints'].items():
+        grid.waypoints[char] = grid.index((i - x_lo, j - y_lo))
+
+    return grid
+
+
+def level_from_grid(grid):
+    """ Converts a GridLevel back into the dictionary form used by show_level and save_level_costs.
+
+    Args:
+        grid: A GridLevel.
+
+    Returns:
+        The level (dict) containing the locations of walls (set), spaces (dict), and waypoints (dict).
+
+    """
+    walls = set()
+    spaces = {}
+    for j in range(grid.height):
+        row = grid.index((0, j))
+        for i in range(grid.width):
+            if grid.walls[row + i]:
+                walls.add((i, j))
+            else:
+                spaces[(i, j)] = grid.costs[row + i]
+
+    waypoints = {char: grid.position(index) for char, index in grid.waypoints.items()}
+
+    return {'walls': walls,
+            'spaces': spaces,
+            'waypoints': waypoints}
+
+
+def show_grid(grid, path=[]):
+    """ Displays a GridLevel via a print statement, like show_level without converting it into a level first.
+
+    Cells that load_level would not record, such as blanks, are walls in a GridLevel and are shown as such.
+
+    Args:
+        grid: The GridLevel to be displayed.
+        path: A continuous path of cell indices to be displayed over the level, if provided.
+
+    """
+    path_cells = set(path)
+    inverted_waypoints = {index: char for char, index in grid.waypoints.items()}
+    walls = grid.walls
+    costs = grid.costs
+
+    chars = []
+    for j in range(grid.height):
+        row = grid.index((0, j))
+        for index in range(row, row + grid.width):
+            if index in path_cells:
+                chars.append('*')
+            elif walls[index]:
+                chars.append('X')
+            elif index in inverted_waypoints:
+                chars.append(inverted_waypoints[index])
+            else:
+                chars.append(str(int(costs[index])))
+
+        chars.append('\n')
+
+    print(''.join(chars))
+
+
+def grid_navigation_edges(grid, index):
+    """ Provides the adjacent cells and their respective costs from the given cell of a GridLevel.
+
+    This is the GridLevel counterpart of navigation_edges, and can be passed as the adj argument of
+    dijkstras_shortest_path and dijkstras_shortest_path_to_all together with a GridLevel as the graph.
+
+    Args:
+        grid: A GridLevel.
+        index: The index of a target cell.
+
+    Returns:
+        A list of tuples containing an adjacent cell's index and the cost of the edge joining it and the
+        originating cell.
+
+    """
+    walls = grid.walls
+    costs = grid.costs
+    half = 0.5 * costs[index]
+
+    return [(index + offset, scale * (half + 0.5 * costs[index + offset]))
+            for offset, scale in grid.offsets
+            if not walls[index + offset]]
+
+
+def grid_path_to_cells(grid, path):
+    """ Converts a path of cell indices into a path of (i, j) cells that show_level can display. """
+    return [grid.position(index) for index in path] if path else path
+
+
+def grid_costs_to_cells(grid, costs):
+    """ Converts a mapping of cell indices to costs into a mapping of (i, j) cells to costs.
+
+    Args:
+        grid: A GridLevel.
+        costs: A dictionary mapping cell indices to costs, or a flat sequence indexed by cell index in which
+            unreachable cells hold inf.
+
+    Returns:
+        A dictionary mapping (i, j) cells to costs, suitable for save_level_costs.
+
+    """
+    if isinstance(costs, dict):
+        return {grid.position(index): cost for index, cost in costs.items()}
+
+    return {grid.position(index): costs[index] for index in grid.cells() if costs[index] != inf}
+
+
+def grid_octile_heuristic(grid):
+    """ Builds an admissible A* heuristic for a GridLevel, the counterpart of octile_heuristic.
+
+    Args:
+        grid: A GridLevel.
+
+    Returns:
+        A function of (index, destination) returning the estimated cost between the two cells.
+
+    """
+    min_cost = grid.min_cost()
+    diagonal = (SQRT2 - 2) * min_cost
+    stride = grid.stride
+
+    def heuristic(index, destination):
+        dy, dx = divmod(index, stride)
+        goal_y, goal_x = divmod(destination, stride)
+        dx = abs(dx - goal_x)
+        dy = abs(dy - goal_y)
+        return min_cost * (dx + dy) + diagonal * (dx if dx < dy else dy)
+
+    return heuristic
+
+
+def save_grid_costs(grid, costs, filename='distance_map.csv', missing=inf):
+    """ Streams a cost field over a GridLevel to a file, one row at a time.
+
+    The file type follows the extension: '.csv' writes the same layout as save_level_costs, '.npy' writes a
+    float32 NumPy array of shape (height, width), and any other extension writes the raw little-endian
+    float32 rows with no header.
+
+    Args:
+        grid: A GridLevel.
+        costs: A flat sequence indexed by cell index holding inf for unreachable cells, such as the fields from
+            cost_fields, or a dictionary mapping cell indices to costs.
+        filename: The name of the file to be created.
+        missing: The value written to a csv file for cells that are not in a dictionary of costs. Other per-cell
+            values, such as the waypoint labels of a territory partition, can then be written the same way.
+
+    """
+    if isinstance(costs, dict):
+        def row_costs(index):
+            return [costs.get(i, missing) for i in range(index, index + grid.width)]
+    else:
+        def row_costs(index):
+            return costs[index:index + grid.width]
+
+    if filename.endswith('.csv'):
+        with open(filename, 'w', newline='') as f:
+            csv_writer = writer(f)
+            for j in range(grid.height):
+                csv_writer.writerow(row_costs(grid.index((0, j))))
+
+    else:
+        with open(filename, 'wb') as f:
+            if filename.endswith('.npy'):
+                header = "{'descr': '<f4', 'fortran_order': False, 'shape': (%d, %d), }" % (grid.height, grid.width)
+                header += ' ' * (63 - (len(header) + 10) % 64) + '\n'
+                f.write(b'\x93NUMPY\x01\x00' + len(header).to_bytes(2, 'little') + header.encode('latin1'))
+
+            for j in range(grid.height):
+                row = array('f', row_costs(grid.index((0, j))))
+                if sys.byteorder != 'little':
+                    row.byteswap()
+                f.write(row.tobytes())
+
+    print("Saved file:", filename)
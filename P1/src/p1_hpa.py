@@ -0,0 +1,156 @@
+# Hierarchical pathfinding (HPA*) over P1 levels
+
+from collections import defaultdict
+
+from p1 import a_star_shortest_path, dijkstras_shortest_path_to_all, navigation_edges, octile_heuristic
+
+MAX_SINGLE_ENTRANCE = 6
+
+
+def build_cluster_graph(level, cluster_size=10):
+    """ Cuts a level into square clusters and builds the abstract graph used by hpa_shortest_path.
+
+    Every maximal run of open cells facing each other across a cluster border is an entrance. Short entrances
+    get one transition at their middle and longer ones get a transition at each end. Transitions in the same
+    cluster are joined by their cost within that cluster, and the two sides of a transition by their edge.
+
+    Args:
+        level: A loaded level, containing walls, spaces, and waypoints.
+        cluster_size: The width and height of a cluster, in cells.
+
+    Returns:
+        The cluster graph (dict) containing the cluster size (int), the transition cells of each cluster
+        (dict), the abstract edges from each transition cell (dict), and the heuristic used for searching it.
+
+    """
+    walls, spaces = level['walls'], level['spaces']
+
+    def is_open(cell):
+        return cell in spaces and cell not in walls
+
+    xs, ys = zip(*spaces.keys()) if spaces else ((0,), (0,))
+    x_hi, y_hi = max(xs), max(ys)
+
+    nodes = defaultdict(set)
+    edges = defaultdict(dict)
+
+    def add_transition(a, b):
+        nodes[_cluster_of(a, cluster_size)].add(a)
+        nodes[_cluster_of(b, cluster_size)].add(b)
+        cost = dict(navigation_edges(level, a))[b]
+        edges[a][b] = cost
+        edges[b][a] = cost
+
+    def pair(axis, border, k, dk=0):
+        return ((border, k), (border + 1, k + dk)) if axis == 0 else ((k, border), (k + dk, border + 1))
+
+    def is_open_pair(a, b):
+        return is_open(a) and is_open(b)
+
+    # vertical borders, between horizontally adjacent clusters, then horizontal borders
+    for axis in (0, 1):
+        border_hi, run_hi = (x_hi, y_hi) if axis == 0 else (y_hi, x_hi)
+        for border in range(cluster_size - 1, border_hi, cluster_size):
+            for start in range(0, run_hi + 1, cluster_size):
+                run = []
+                for k in range(start, min(start + cluster_size, run_hi + 1) + 1):
+                    if k < start + cluster_size and is_open_pair(*pair(axis, border, k)):
+                        run.append(pair(axis, border, k))
+                        continue
+
+                    # a diagonal step across the border is an entrance of its own when no straight step is open
+                    for dk in (-1, 1):
+                        if k < start + cluster_size and is_open_pair(*pair(axis, border, k, dk)) and \
+                                not is_open_pair(*pair(axis, border, k + dk)):
+                            add_transition(*pair(axis, border, k, dk))
+
+                    if len(run) > MAX_SINGLE_ENTRANCE:
+                        add_transition(*run[0])
+                        add_transition(*run[-1])
+                    elif run:
+                        add_transition(*run[len(run) // 2])
+                    run = []
+
+    # intra-cluster costs between the transitions of each cluster
+    for cluster, cells in nodes.items():
+        adj = _cluster_edges(cluster, cluster_size)
+        for cell in cells:
+            costs = dijkstras_shortest_path_to_all(cell, level, adj)
+            for other in cells:
+                if other != cell and other in costs:
+                    edges[cell][other] = costs[other]
+
+    return {'cluster_size': cluster_size,
+            'nodes': {cluster: sorted(cells) for cluster, cells in nodes.items()},
+            'edges': {cell: list(neighbors.items()) for cell, neighbors in edges.items()},
+            'heuristic': octile_heuristic(level)}
+
+
+def hpa_shortest_path(initial_position, destination, level, cluster_graph):
+    """ Searches for a path by routing over the cluster graph first, then refining each abstract step locally.
+
+    The returned path is near-optimal: it may cost slightly more than the one found by
+    dijkstras_shortest_path, since it can only cross cluster borders at transitions.
+
+    Args:
+        initial_position: The initial cell from which the path extends.
+        destination: The end location for the path.
+        level: A loaded level, containing walls, spaces, and waypoints.
+        cluster_graph: The result of build_cluster_graph for the level.
+
+    Returns:
+        If a path exists, return a list containing all cells from initial_position to destination.
+        Otherwise, return None.
+
+    """
+    size = cluster_graph['cluster_size']
+    heuristic = cluster_graph['heuristic']
+    start_cluster = _cluster_of(initial_position, size)
+    goal_cluster = _cluster_of(destination, size)
+
+    # temporarily connect the endpoints to the transitions of their own clusters
+    extra = defaultdict(list)
+    start_costs = dijkstras_shortest_path_to_all(initial_position, level, _cluster_edges(start_cluster, size))
+    for cell in cluster_graph['nodes'].get(start_cluster, []):
+        if cell in start_costs:
+            extra[initial_position].append((cell, start_costs[cell]))
+
+    goal_costs = dijkstras_shortest_path_to_all(destination, level, _cluster_edges(goal_cluster, size))
+    for cell in cluster_graph['nodes'].get(goal_cluster, []):
+        if cell in goal_costs:
+            extra[cell].append((destination, goal_costs[cell]))
+
+    if destination in start_costs:
+        extra[initial_position].append((destination, start_costs[destination]))
+
+    def abstract_edges(graph, cell):
+        return graph['edges'].get(cell, []) + extra.get(cell, [])
+
+    abstract_path = a_star_shortest_path(initial_position, destination, cluster_graph, abstract_edges, heuristic)
+    if abstract_path is None:
+        return None
+
+    # refine each abstract step into cells, keeping the destination-first order of abstract_path
+    path = [destination]
+    for a, b in zip(abstract_path, abstract_path[1:]):
+        cluster = _cluster_of(a, size)
+        if cluster == _cluster_of(b, size):
+            local_path = a_star_shortest_path(b, a, level, _cluster_edges(cluster, size), heuristic)
+            path.extend(local_path[1:])
+        else:
+            path.append(b)
+
+    return path
+
+
+def _cluster_of(cell, cluster_size):
+    return cell[0] // cluster_size, cell[1] // cluster_size
+
+
+def _cluster_edges(cluster, cluster_size):
+    """ Returns an adjacency function like navigation_edges that never leaves the given cluster. """
+    def adj(level, cell):
+        return [(new_cell, cost) for new_cell, cost in navigation_edges(level, cell)
+                if _cluster_of(new_cell, cluster_size) == cluster]
+
+    return adj
@@ -0,0 +1,211 @@
+# Jump Point Search over GridLevels for P1
+
+from collections import Counter
+from heapq import heappop, heappush
+
+from p1_grid import SQRT2, grid_octile_heuristic
+
+
+def jump_point_mask(grid, cost=None):
+    """ Finds the cells of a GridLevel that lie inside regions of uniform cost.
+
+    A cell is uniform when it has the given cost and each of its eight neighbors is either a wall or has that
+    same cost as well. Jump Point Search only skips over uniform cells; every other cell is expanded plainly.
+
+    Args:
+        grid: A GridLevel.
+        cost: The cost of the uniform floor. Defaults to the most common cell cost in the level.
+
+    Returns:
+        A tuple of the uniform cost and a bytearray mapping cell indices to 1 for uniform cells.
+
+    """
+    walls = grid.walls
+    costs = grid.costs
+
+    if cost is None:
+        counts = Counter(costs[index] for index in grid.cells())
+        cost = counts.most_common(1)[0][0] if counts else 1.
+
+    floor = bytes(1 if not wall and c == cost else 0 for wall, c in zip(walls, costs))
+    passable = bytes(1 if wall or c == cost else 0 for wall, c in zip(walls, costs))
+
+    # AND the floor flags against the passable flags shifted onto each neighbor, as one big integer per buffer
+    bits = int.from_bytes(floor, 'little')
+    neighbors = int.from_bytes(passable, 'little')
+    for offset, _ in grid.offsets:
+        bits &= neighbors >> (8 * offset) if offset > 0 else neighbors << (-8 * offset)
+
+    return cost, bytearray(bits.to_bytes(grid.size, 'little'))
+
+
+def jump_point_search(initial_position, destination, grid, mask=None, heuristic=None, probe=None):
+    """ Searches for a minimal cost path through a GridLevel using Jump Point Search.
+
+    Inside uniform cost regions only jump points are placed on the heap; everywhere else cells are expanded
+    with all their neighbors, as in dijkstras_shortest_path. The path cost always matches the one found by
+    dijkstras_shortest_path with grid_navigation_edges.
+
+    Args:
+        initial_position: The index of the initial cell from which the path extends.
+        destination: The index of the end location for the path.
+        grid: A GridLevel.
+        mask: The result of jump_point_mask for the grid, computed if not provided.
+        heuristic: An admissible heuristic of (index, destination), defaulting to grid_octile_heuristic.
+        probe: An optional SearchProbe that collects counters from the search. Only jump points are counted.
+
+    Returns:
+        If a path exists, return a list containing all cells from initial_position to destination.
+        Otherwise, return None.
+
+    """
+    if mask is None:
+        mask = jump_point_mask(grid)
+    if heuristic is None:
+        heuristic = grid_octile_heuristic(grid)
+
+    uniform_cost, uniform = mask
+    walls = grid.walls
+    costs = grid.costs
+    stride = grid.stride
+
+    queue = []
+    heappush(queue, (heuristic(initial_position, destination), 0, initial_position))
+
+    came_from = {initial_position: None}
+    cost_so_far = {initial_position: 0}
+    direction = {initial_position: None}
+
+    while queue:
+        _, current_cost, current_node = heappop(queue)
+
+        if cost_so_far[current_node] < current_cost:
+            if probe:
+                probe.stale()
+            continue
+
+        if probe:
+            probe.expanded(current_node, current_cost)
+
+        if current_node == destination:
+            if probe:
+                probe.finished(current_cost)
+            return _fill_path(grid, came_from, destination)
+
+        dx_dy = direction[current_node]
+        if dx_dy is None or not uniform[current_node]:
+            # plain expansion into every open neighbor
+            half = 0.5 * costs[current_node]
+            successors = []
+            for offset, scale in grid.offsets:
+                new_node = current_node + offset
+                if not walls[new_node]:
+                    successors.append((new_node, scale * (half + 0.5 * costs[new_node]),
+                                       _direction_of(offset, stride)))
+        else:
+            successors = []
+            for dx, dy in _pruned_directions(walls, stride, current_node, *dx_dy):
+                jump = _jump(walls, uniform, stride, current_node, dx, dy, destination)
+                if jump is not None:
+                    steps = max(abs(a - b) for a, b in zip(grid.position(jump), grid.position(current_node)))
+                    scale = SQRT2 if dx and dy else 1.
+                    successors.append((jump, steps * scale * uniform_cost, (dx, dy)))
+
+        for new_node, new_cost, new_direction in successors:
+            pathcost = current_cost + new_cost
+
+            if new_node not in cost_so_far or pathcost < cost_so_far[new_node]:
+                cost_so_far[new_node] = pathcost
+                heappush(queue, (pathcost + heuristic(new_node, destination), pathcost, new_node))
+                came_from[new_node] = current_node
+                direction[new_node] = new_direction
+                if probe:
+                    probe.relaxed(len(queue))
+
+    return None
+
+
+def _direction_of(offset, stride):
+    dy, dx = divmod(offset + stride + 1, stride)
+    return dx - 1, dy - 1
+
+
+def _pruned_directions(walls, stride, node, dx, dy):
+    """ Returns the natural and forced neighbor directions of a uniform cell entered moving in (dx, dy). """
+    directions = []
+    if dx and dy:
+        if not walls[node + dy * stride]:
+            directions.append((0, dy))
+        if not walls[node + dx]:
+            directions.append((dx, 0))
+        if not walls[node + dx + dy * stride]:
+            directions.append((dx, dy))
+        if walls[node - dx] and not walls[node - dx + dy * stride]:
+            directions.append((-dx, dy))
+        if walls[node - dy * stride] and not walls[node + dx - dy * stride]:
+            directions.append((dx, -dy))
+    elif dx:
+        if not walls[node + dx]:
+            directions.append((dx, 0))
+        if walls[node + stride] and not walls[node + dx + stride]:
+            directions.append((dx, 1))
+        if walls[node - stride] and not walls[node + dx - stride]:
+            directions.append((dx, -1))
+    else:
+        if not walls[node + dy * stride]:
+            directions.append((0, dy))
+        if walls[node + 1] and not walls[node + 1 + dy * stride]:
+            directions.append((1, dy))
+        if walls[node - 1] and not walls[node - 1 + dy * stride]:
+            directions.append((-1, dy))
+    return directions
+
+
+def _jump(walls, uniform, stride, node, dx, dy, destination):
+    """ Walks from node in direction (dx, dy) and returns the next jump point, or None if a wall is hit first.
+
+    Besides cells with forced neighbors, the walk stops on the destination and on the first cell that is not
+    uniform, so that cell gets expanded plainly.
+
+    """
+    step = dx + dy * stride
+    current = node + step
+
+    while True:
+        if walls[current]:
+            return None
+        if current == destination or not uniform[current]:
+            return current
+
+        if dx and dy:
+            if (walls[current - dx] and not walls[current - dx + dy * stride]) or \
+                    (walls[current - dy * stride] and not walls[current + dx - dy * stride]):
+                return current
+            if _jump(walls, uniform, stride, current, dx, 0, destination) is not None or \
+                    _jump(walls, uniform, stride, current, 0, dy, destination) is not None:
+                return current
+        elif dx:
+            if (walls[current + stride] and not walls[current + dx + stride]) or \
+                    (walls[current - stride] and not walls[current + dx - stride]):
+                return current
+        else:
+            if (walls[current + 1] and not walls[current + 1 + dy * stride]) or \
+                    (walls[current - 1] and not walls[current - 1 + dy * stride]):
+                return current
+
+        current += step
+
+
+def _fill_path(grid, came_from, destination):
+    """ Expands the jump points recorded in came_from into every cell of the path, destination first. """
+    path = [destination]
+    current = destination
+    while came_from[current] is not None:
+        parent = came_from[current]
+        (x, y), (px, py) = grid.position(current), grid.position(parent)
+        step = (px > x) - (px < x) + ((py > y) - (py < y)) * grid.stride
+        while current != parent:
+            current += step
+            path.append(current)
+
+    return path
@@ -0,0 +1,149 @@
+# Landmark (ALT) heuristic index for P1
+
+import hashlib
+import os
+import pickle
+from array import array
+from math import inf
+
+from p1_batch import SearchWorkspace
+from p1_grid import load_grid_level
+
+
+def build_landmark_index(grid, count=8):
+    """ Picks landmark cells spread across a GridLevel and stores the exact cost field from each of them.
+
+    Landmarks are chosen by farthest-point selection: each new landmark is the reachable cell whose cost to the
+    nearest landmark chosen so far is the greatest, starting from the cell farthest from the first waypoint.
+
+    Args:
+        grid: A GridLevel.
+        count: The number of landmarks to place.
+
+    Returns:
+        The landmark index (dict) containing the landmark cell indices (list) and, for each landmark, an
+        array('d') mapping cell indices to the cost of a path from that landmark, inf where unreachable (list).
+
+    """
+    if grid.waypoints:
+        seed = min(grid.waypoints.values())
+    else:
+        seed = next(grid.cells())
+
+    workspace = SearchWorkspace(grid)
+    landmarks = []
+    fields = []
+
+    # cost from each cell to its nearest landmark so far, -1 for cells out of reach
+    nearest = array('d', (-1. if cost == inf else cost for cost in workspace.run(seed)))
+    cells = range(grid.size)
+
+    while len(landmarks) < count:
+        landmark = max(cells, key=nearest.__getitem__)
+        if nearest[landmark] <= 0:
+            break
+
+        field = array('d', workspace.run(landmark))
+        landmarks.append(landmark)
+        fields.append(field)
+
+        for index in cells:
+            if field[index] < nearest[index]:
+                nearest[index] = field[index]
+
+    return {'landmarks': landmarks, 'fields': fields}
+
+
+def alt_heuristic(index):
+    """ Builds an admissible A* heuristic over GridLevel cell indices from a landmark index.
+
+    For any landmark L, |d(L, destination) - d(L, cell)| never exceeds the cost between cell and destination,
+    since edge costs are symmetric. The heuristic takes the largest such bound over all landmarks.
+
+    Args:
+        index: A landmark index returned by build_landmark_index or load_landmark_index.
+
+    Returns:
+        A function of (cell, destination) cell indices returning the estimated cost between the two cells.
+
+    """
+    fields = index['fields']
+    goal = {'cell': None, 'costs': []}
+
+    def heuristic(cell, destination):
+        if goal['cell'] != destination:
+            goal['cell'] = destination
+            goal['costs'] = [(field, field[destination]) for field in fields if field[destination] != inf]
+
+        bound = 0
+        for field, destination_cost in goal['costs']:
+            cost = field[cell]
+            if cost != inf and abs(destination_cost - cost) > bound:
+                bound = abs(destination_cost - cost)
+        return bound
+
+    return heuristic
+
+
+def landmark_index_filename(filename):
+    """ Returns the name of the landmark index file stored next to a level file. """
+    return filename + '.landmarks.pickle'
+
+
+def save_landmark_index(index, filename):
+    """ Saves a landmark index next to the level file it was built from.
+
+    Args:
+        index: A landmark index returned by build_landmark_index.
+        filename: The name of the level's text file. A digest of its contents is stored with the index.
+            The cost fields are pickled as flat arrays of doubles, not per cell.
+
+    """
+    with open(landmark_index_filename(filename), 'wb') as f:
+        pickle.dump(dict(index, digest=_level_digest(filename)), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    print("Saved file:", landmark_index_filename(filename))
+
+
+def load_landmark_index(filename, count=8):
+    """ Loads the landmark index stored next to a level file, building and saving it first if needed.
+
+    The index is rebuilt when it is missing, was built for a different version of the level file, or holds
+    fewer than count landmarks.
+
+    Args:
+        filename: The name of the level's text file.
+        count: The number of landmarks to place when building the index.
+
+    Returns:
+        The landmark index (dict).
+
+    """
+    index_filename = landmark_index_filename(filename)
+    if os.path.exists(index_filename):
+        with open(index_filename, 'rb') as f:
+            index = pickle.load(f)
+        if index.get('digest') == _level_digest(filename) and len(index['landmarks']) >= count:
+            return index
+
+    index = build_landmark_index(load_grid_level(filename), count)
+    save_landmark_index(index, filename)
+    return index
+
+
+def _level_digest(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) not in (2, 3):
+        print("usage: %s level_filename [landmark_count]" % sys.argv[0])
+        sys.exit(-1)
+
+    level_filename = sys.argv[1]
+    landmark_count = int(sys.argv[2]) if len(sys.argv) == 3 else 8
+
+    save_landmark_index(build_landmark_index(load_grid_level(level_filename), landmark_count), level_filename)
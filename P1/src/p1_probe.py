@@ -0,0 +1,68 @@
+# Search instrumentation for the P1 search engines
+
+import json
+
+
+class SearchProbe:
+    def __init__(self, trace=False):
+        """ Collects counters from a search it is passed to through the search's probe argument.
+
+        Searches only touch a probe when one is given, so leaving the probe argument as None costs nothing
+        beyond a test per event.
+
+        Args:
+            trace: Whether to also record every expanded cell and its cost, in expansion order.
+
+        """
+        self.expansions = 0                         # Cells popped from the heap and expanded
+        self.stale_pops = 0                         # Heap entries popped after a cheaper entry for the cell
+        self.relaxations = 0                        # Edges that improved a cell's cost, each pushing an entry
+        self.heap_peak = 0                          # Largest size the heap reached
+        self.cost = None                            # Cost of the path found, if the search has a destination
+        self.trace = [] if trace else None          # (cell, cost) for every expansion, if tracing
+
+    def expanded(self, cell, cost):
+        self.expansions += 1
+        if self.trace is not None:
+            self.trace.append((cell, cost))
+
+    def stale(self):
+        self.stale_pops += 1
+
+    def relaxed(self, heap_size):
+        self.relaxations += 1
+        if heap_size > self.heap_peak:
+            self.heap_peak = heap_size
+
+    def finished(self, cost):
+        self.cost = cost
+
+    def counters(self):
+        """ Returns the counters as a dictionary. """
+        return {'expansions': self.expansions,
+                'stale_pops': self.stale_pops,
+                'relaxations': self.relaxations,
+                'heap_peak': self.heap_peak,
+                'cost': self.cost}
+
+    def to_json(self, filename=None):
+        """ Exports the counters, and the trace if one was recorded, as JSON.
+
+        Args:
+            filename: If provided, the name of the json file to be created.
+
+        Returns:
+            The JSON text.
+
+        """
+        data = self.counters()
+        if self.trace is not None:
+            data['trace'] = [[list(cell) if isinstance(cell, tuple) else cell, cost] for cell, cost in self.trace]
+
+        text = json.dumps(data)
+        if filename is not None:
+            with open(filename, 'w') as f:
+                f.write(text)
+            print("Saved file:", filename)
+
+        return text
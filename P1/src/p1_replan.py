@@ -0,0 +1,179 @@
+# Incremental replanning (D* Lite) for P1 levels whose cells change at runtime
+
+from heapq import heappop, heappush
+from math import inf, sqrt
+
+from p1 import navigation_edges
+from p1_support import set_level_cell
+
+# Relative difference below which two keys count as equal. Keys are sums of the same costs added in different
+# orders, so equal keys can differ in their last bits.
+KEY_TOLERANCE = 1e-9
+
+
+class DStarLitePlanner:
+    def __init__(self, level, start, goal, adj=navigation_edges):
+        """ Initializes a planner that keeps a shortest path from start to goal up to date as the level changes.
+
+        The planner searches backward from goal, so the costs it has settled stay valid when the agent moves
+        along the path, and a batch of cell changes only repairs the part of the search the changes reach.
+
+        Args:
+            level:  A loaded level, containing walls, spaces, and waypoints. The planner edits it in place.
+            start:  The cell the path extends from.
+            goal:   The end location for the path.
+            adj:    An adjacency function returning cells adjacent to a given cell and their edge costs.
+
+        """
+        self.level = level
+        self.adj = adj
+        self.start = start
+        self.goal = goal
+        self._reset()
+
+    def _reset(self):
+        self.min_cost = min(self.level['spaces'].values(), default=0.)     # Scale of the octile heuristic
+        self.last_start = self.start    # Start at the time km was last updated
+        self.km = 0                     # Heuristic drift accumulated as the start moved
+        self.g = {}                     # Cell -> settled cost to the goal
+        self.rhs = {self.goal: 0}       # Cell -> one step lookahead cost to the goal
+        self.queue = []                 # Heap of (key, cell) for locally inconsistent cells
+        self.open = {}                  # Cell -> key of its live heap entry
+        self._push(self.goal)
+
+    def heuristic(self, a, b):
+        dx = abs(a[0] - b[0])
+        dy = abs(a[1] - b[1])
+        return self.min_cost * (dx + dy + (sqrt(2) - 2) * min(dx, dy))
+
+    def _key(self, cell):
+        best = min(self.g.get(cell, inf), self.rhs.get(cell, inf))
+        return best + self.heuristic(self.start, cell) + self.km, best
+
+    def _push(self, cell):
+        key = self._key(cell)
+        self.open[cell] = key
+        heappush(self.queue, (key, cell))
+
+    def _after(self, a, b):
+        """ Returns whether key a sorts after key b by more than KEY_TOLERANCE, comparing lexicographically. """
+        for x, y in zip(a, b):
+            if abs(x - y) > KEY_TOLERANCE * max(1., abs(y)):
+                return x > y
+        return False
+
+    def _top_key(self):
+        queue = self.queue
+        while queue and self.open.get(queue[0][1]) != queue[0][0]:
+            heappop(queue)
+        return queue[0][0] if queue else (inf, inf)
+
+    def _edges(self, cell):
+        if cell in self.level['walls'] or cell not in self.level['spaces']:
+            return []
+        return self.adj(self.level, cell)
+
+    def _neighbors(self, cell):
+        """ Returns the open cells around cell, including around cells that are currently walls. """
+        walls, spaces = self.level['walls'], self.level['spaces']
+        x, y = cell
+        return [(x + i, y + j) for i in (-1, 0, 1) for j in (-1, 0, 1)
+                if (i or j) and (x + i, y + j) in spaces and (x + i, y + j) not in walls]
+
+    def _update_vertex(self, cell):
+        if cell != self.goal:
+            g = self.g
+            self.rhs[cell] = min((cost + g.get(new_cell, inf) for new_cell, cost in self._edges(cell)), default=inf)
+
+        self.open.pop(cell, None)
+        if self.g.get(cell, inf) != self.rhs.get(cell, inf):
+            self._push(cell)
+
+    def compute_shortest_path(self):
+        """ Settles cells until the start's cost to the goal is known, touching only inconsistent cells.
+
+        Cells whose keys tie with the start's, up to rounding, are settled too, since any of them may still
+        lower or raise the start's cost.
+
+        """
+        g, rhs = self.g, self.rhs
+
+        while (not self._after(self._top_key(), self._key(self.start)) and self.queue) or \
+                rhs.get(self.start, inf) != g.get(self.start, inf):
+            old_key, cell = heappop(self.queue)
+            new_key = self._key(cell)
+
+            if old_key < new_key:
+                self._push(cell)
+            elif g.get(cell, inf) > rhs.get(cell, inf):
+                g[cell] = rhs[cell]
+                del self.open[cell]
+                for new_cell in self._neighbors(cell):
+                    self._update_vertex(new_cell)
+            else:
+                g.pop(cell, None)
+                del self.open[cell]
+                self._update_vertex(cell)
+                for new_cell in self._neighbors(cell):
+                    self._update_vertex(new_cell)
+
+    def shortest_path(self):
+        """ Returns the current shortest path, ordered from goal to start like dijkstras_shortest_path.
+
+        Returns:
+            If a path exists, a list containing all cells from start to goal. Otherwise, None.
+
+        Raises:
+            RuntimeError: If following the settled costs revisits a cell, which would otherwise loop forever.
+
+        """
+        self.compute_shortest_path()
+        if self.g.get(self.start, inf) == inf:
+            return None
+
+        path = [self.start]
+        visited = {self.start}
+        while path[-1] != self.goal:
+            g = self.g
+            cell = min(self._edges(path[-1]), key=lambda edge: edge[1] + g.get(edge[0], inf))[0]
+            if cell in visited:
+                raise RuntimeError("The path from %s revisits %s; the planner's costs are inconsistent"
+                                   % (self.start, cell))
+            visited.add(cell)
+            path.append(cell)
+
+        return path[::-1]
+
+    def cost(self):
+        """ Returns the current cost of the shortest path, or inf if there is none. """
+        self.compute_shortest_path()
+        return self.g.get(self.start, inf)
+
+    def move_start(self, cell):
+        """ Moves the start of the path, typically to the next cell the agent stepped onto. """
+        self.km += self.heuristic(self.last_start, cell)
+        self.last_start = cell
+        self.start = cell
+
+    def update_cells(self, changes):
+        """ Applies a batch of cell changes to the level and repairs the search around them.
+
+        Args:
+            changes: A dictionary mapping cells to their new cost, or to None for cells that become walls.
+
+        """
+        restart = False
+
+        for cell, cost in changes.items():
+            set_level_cell(self.level, cell, cost)
+            # a cheaper cell than the heuristic assumed would make it overestimate
+            restart = restart or (cost is not None and cost < self.min_cost)
+
+        if restart:
+            self._reset()
+            return
+
+        for cell in changes:
+            self._update_vertex(cell)
+            for new_cell in self._neighbors(cell):
+                self._update_vertex(new_cell)
@@ -0,0 +1,200 @@
+# Batch runner serving P1 route and cost-field jobs over many levels in parallel
+
+from csv import writer
+from itertools import groupby
+from multiprocessing import Pool
+import json
+import os
+import sys
+import time
+
+from p1 import a_star_shortest_path
+from p1_batch import SearchWorkspace
+from p1_grid import grid_navigation_edges, grid_octile_heuristic, load_grid_level_mmap, save_grid_costs
+from p1_probe import SearchProbe
+
+TIMING_COLUMNS = ('job', 'level', 'src', 'dst', 'status', 'cost', 'load_seconds', 'search_seconds',
+                  'write_seconds', 'output')
+
+
+def read_manifest(filename):
+    """ Reads a manifest of jobs, one JSON object per line.
+
+    Each job names a level file, relative to the manifest, a source waypoint, and either a destination
+    waypoint or null (or "*") for the cost to all cells. An optional "id" names the job's output files.
+    Blank lines and lines starting with '#' are skipped.
+
+    E.g.
+        {"level": "my_maze.txt", "src": "a", "dst": "d"}
+        {"level": "my_maze.txt", "src": "a", "dst": null, "id": "a_costs"}
+
+    Returns:
+        A list of job dictionaries with the level path resolved and an id filled in.
+
+    Raises:
+        ValueError: If a line is not a JSON object with string "level" and "src" entries.
+
+    """
+    base = os.path.dirname(os.path.abspath(filename))
+    jobs = []
+    with open(filename, "r") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            try:
+                job = json.loads(line)
+            except ValueError as error:
+                raise ValueError("%s:%d: %s" % (filename, number, error))
+            if not isinstance(job, dict) or not isinstance(job.get('level'), str) \
+                    or not isinstance(job.get('src'), str):
+                raise ValueError("%s:%d: a job needs string \"level\" and \"src\" entries" % (filename, number))
+
+            job['level'] = os.path.join(base, job['level'])
+            job['dst'] = None if job.get('dst') in (None, '*') else job['dst']
+            job.setdefault('id', 'job%d' % number)
+            jobs.append(job)
+
+    return jobs
+
+
+def shard_jobs(jobs, shard_size):
+    """ Groups jobs by level and splits each group into shards of at most shard_size jobs. """
+    shards = []
+    for _, group in groupby(sorted(jobs, key=lambda job: job['level']), key=lambda job: job['level']):
+        group = list(group)
+        shards.extend(group[i:i + shard_size] for i in range(0, len(group), shard_size))
+    return shards
+
+
+# Levels most recently loaded by this process, oldest first. Shards group jobs by level, so keeping the last
+# few is enough for a worker to load each level about once per shard without holding every level it has seen.
+_levels = {}
+MAX_LEVELS = 2
+
+
+def _load(filename):
+    if filename not in _levels:
+        grid = load_grid_level_mmap(filename)
+        _levels[filename] = (grid, SearchWorkspace(grid), grid_octile_heuristic(grid))
+        if len(_levels) > MAX_LEVELS:
+            del _levels[next(iter(_levels))]
+    return _levels[filename]
+
+
+def run_job(job, output_dir, cost_format='npy'):
+    """ Runs one job and writes its output file.
+
+    A route job writes the path as 'i,j' lines from source to destination in <id>.path.csv. An all-cells job
+    writes the cost field in <id>.costs.<cost_format>, in any format save_grid_costs supports.
+
+    Returns:
+        A dictionary with the TIMING_COLUMNS of the job. A job that fails has an 'error: ...' status rather than
+        raising, so that one bad job does not stop the others.
+
+    """
+    result = {'job': job.get('id', ''), 'level': job.get('level', ''), 'src': job.get('src', ''),
+              'dst': job.get('dst') or '*', 'status': 'ok', 'cost': '', 'load_seconds': 0., 'search_seconds': 0.,
+              'write_seconds': 0., 'output': ''}
+
+    try:
+        _run_job(job, output_dir, cost_format, result)
+    except Exception as error:
+        result['status'] = 'error: %r' % error
+    return result
+
+
+def _run_job(job, output_dir, cost_format, result):
+    start = time.perf_counter()
+    grid, workspace, heuristic = _load(job['level'])
+    src = grid.waypoints[job['src']]
+    dst = grid.waypoints[job['dst']] if job.get('dst') else None
+    result['load_seconds'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if dst is None:
+        costs = workspace.run(src)
+    else:
+        probe = SearchProbe()
+        path = a_star_shortest_path(src, dst, grid, grid_navigation_edges, heuristic, probe)
+    result['search_seconds'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if dst is None:
+        result['output'] = os.path.join(output_dir, '%s.costs.%s' % (job['id'], cost_format))
+        save_grid_costs(grid, costs, result['output'])
+    elif path is None:
+        result['status'] = 'no path'
+    else:
+        result['output'] = os.path.join(output_dir, '%s.path.csv' % job['id'])
+        result['cost'] = probe.cost
+        with open(result['output'], 'w', newline='') as f:
+            csv_writer = writer(f)
+            for index in reversed(path):
+                csv_writer.writerow(grid.position(index))
+    result['write_seconds'] = time.perf_counter() - start
+
+
+def _run_shard(shard, output_dir, cost_format):
+    return [run_job(job, output_dir, cost_format) for job in shard]
+
+
+def _run_shard_args(args):
+    return _run_shard(*args)
+
+
+def serve_manifest(manifest_filename, output_dir, processes=None, shard_size=16, cost_format='npy'):
+    """ Runs every job of a manifest, sharded by level across a process pool, and streams the results.
+
+    Outputs are written to output_dir as each job finishes, and the timing of every job is appended to
+    output_dir/timings.csv and printed as soon as its shard completes.
+
+    Args:
+        manifest_filename: The name of the manifest file, as read by read_manifest.
+        output_dir: The directory to write outputs and timings to, created if needed.
+        processes: The number of worker processes, defaulting to the number of CPUs. Use 1 to run in-process.
+        shard_size: The most jobs on the same level handed to a worker at once.
+        cost_format: The file extension used for cost fields: 'npy', 'csv', or 'f32'.
+
+    Returns:
+        The list of timing dictionaries, in completion order.
+
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    shards = shard_jobs(read_manifest(manifest_filename), shard_size)
+    tasks = [(shard, output_dir, cost_format) for shard in shards]
+
+    results = []
+    start = time.perf_counter()
+    with open(os.path.join(output_dir, 'timings.csv'), 'w', newline='') as f:
+        csv_writer = writer(f)
+        csv_writer.writerow(TIMING_COLUMNS)
+
+        def record(shard_results):
+            for result in shard_results:
+                csv_writer.writerow([result[column] for column in TIMING_COLUMNS])
+                print("%s %s %s->%s %s load %.4fs search %.4fs write %.4fs" % (
+                    result['job'], os.path.basename(result['level']), result['src'], result['dst'],
+                    result['status'], result['load_seconds'], result['search_seconds'], result['write_seconds']))
+            f.flush()
+            results.extend(shard_results)
+
+        if processes == 1:
+            for task in tasks:
+                record(_run_shard(*task))
+        else:
+            with Pool(processes) as pool:
+                for shard_results in pool.imap_unordered(_run_shard_args, tasks):
+                    record(shard_results)
+
+    print("Ran %d jobs in %.4f seconds." % (len(results), time.perf_counter() - start))
+    return results
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4):
+        print("usage: %s manifest.jsonl output_dir [processes]" % sys.argv[0])
+        sys.exit(-1)
+
+    serve_manifest(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else None)
@@ -40,6 +40,27 @@ def load_level(filename):
     return level
 
 
+def set_level_cell(level, cell, cost):
+    """ Marks a cell of a loaded level as open space with the given cost, or as a wall if cost is None.
+
+    Edits made this way are counted in the level's 'version' entry, like GridLevel.set_cell counts them, so that
+    caches built over the level can tell it changed.
+
+    Args:
+        level: A loaded level, edited in place.
+        cell: The (i, j) cell to change.
+        cost: The new cost of the cell, or None to make it a wall.
+
+    """
+    if cost is None:
+        level['walls'].add(cell)
+        level['spaces'].pop(cell, None)
+    else:
+        level['walls'].discard(cell)
+        level['spaces'][cell] = cost
+    level['version'] = level.get('version', 0) + 1
+
+
 def show_level(level, path=[]):
     """ Displays a level via a print statement.
 
@@ -77,37 +98,27 @@ def show_level(level, path=[]):
     print(''.join(chars))
 
 
-def save_level_costs(level, costs, filename='distance_map.csv'):
+def save_level_costs(level, costs, filename='distance_map.csv', missing=inf):
     """ Displays cell costs from an origin point over the given level.
 
     Args:
         level: The level to be displayed.
-        costs: A dictionary containing a mapping of cells to costs from an origin point.
+        costs: A dictionary containing a mapping of cells to costs from an origin point. Any other per-cell
+            values, such as the waypoint labels of a territory partition, are written the same way.
         filename: The name of the csv file to be created.
+        missing: The value written for cells that are not in costs.
 
     """
     xs, ys = zip(*(list(level['spaces'].keys()) + list(level['walls'])))
     x_lo, x_hi = min(xs), max(xs)
     y_lo, y_hi = min(ys), max(ys)
 
-    rows = []
-    for j in range(y_lo, y_hi + 1):
-        row = []
-
-        for i in range(x_lo, x_hi + 1):
-            cell = (i, j)
-            if cell not in costs:
-                row.append(inf)
-            else:
-                row.append(costs[cell])
-
-        rows.append(row)
-
     assert '.csv' in filename, 'Error: filename does not contain file type.'
     with open(filename, 'w', newline='') as f:
         csv_writer = writer(f)
-        for row in rows:
-            csv_writer.writerow(row)
-            
-    
+
+        # write each row as soon as it is built rather than holding the whole grid in memory
+        for j in range(y_lo, y_hi + 1):
+            csv_writer.writerow([costs.get((i, j), missing) for i in range(x_lo, x_hi + 1)])
+
     print("Saved file:", filename)
\ No newline at end of file
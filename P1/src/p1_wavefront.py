@@ -0,0 +1,74 @@
+# Vectorized cost fields over GridLevels for P1, using NumPy
+
+import numpy
+
+from p1_grid import SQRT2
+
+
+def wavefront_cost_field(grid, source, delta=None):
+    """ Calculates the minimum cost from source to every cell of a GridLevel by wavefront relaxation.
+
+    Each round relaxes the eight neighbor shifts of every cell whose cost dropped in the previous round, as
+    whole-array operations, until no cost changes. Rounds are limited to cells whose cost lies below a bound
+    that advances in steps of delta, so the front moves in cost order like a bucketed Dijkstra. The result
+    matches dijkstras_shortest_path_to_all with grid_navigation_edges within float tolerance.
+
+    Args:
+        grid: A GridLevel.
+        source: The index of the cell from which paths extend.
+        delta: The width of each cost band, defaulting to the most expensive diagonal edge in the grid.
+
+    Returns:
+        A flat float64 array indexed by cell index, holding inf for unreachable cells. It can be passed to
+        grid_costs_to_cells or save_grid_costs, or viewed as rows with cost_field_rows.
+
+    """
+    half = 0.5 * numpy.frombuffer(grid.costs, dtype=numpy.float64)
+    is_open = numpy.frombuffer(grid.walls, dtype=numpy.uint8) == 0
+
+    dist = numpy.full(grid.size, numpy.inf)
+    dist[source] = 0
+
+    # relax in bands of cost, as in delta-stepping, so cells far behind the front are not relaxed repeatedly
+    band = delta if delta is not None else SQRT2 * max(half.max() * 2, 1.)
+    bound = band
+    frontier = numpy.array([source])
+    deferred = []
+
+    while frontier.size or deferred:
+        if not frontier.size:
+            pending = numpy.unique(numpy.concatenate(deferred))
+            if not pending.size:
+                break
+            bound = max(bound, dist[pending].min()) + band
+            frontier = pending[dist[pending] < bound]
+            deferred = [pending[dist[pending] >= bound]]
+            continue
+
+        frontier_dist = dist[frontier]
+        frontier_half = half[frontier]
+        changed = []
+
+        for offset, scale in grid.offsets:
+            neighbors = frontier + offset
+            reachable = is_open[neighbors]
+            neighbors = neighbors[reachable]
+
+            pathcost = frontier_dist[reachable] + scale * (frontier_half[reachable] + half[neighbors])
+            better = pathcost < dist[neighbors]
+
+            # the frontier holds each cell once, so one shift never writes the same neighbor twice
+            dist[neighbors[better]] = pathcost[better]
+            changed.append(neighbors[better])
+
+        changed = numpy.unique(numpy.concatenate(changed))
+        near = dist[changed] < bound
+        frontier = changed[near]
+        deferred.append(changed[~near])
+
+    return dist
+
+
+def cost_field_rows(grid, dist):
+    """ Returns a (height, width) view of a flat cost field, without the grid's wall border. """
+    return dist.reshape(grid.height + 2, grid.stride)[1:-1, 1:-1]
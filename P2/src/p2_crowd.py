@@ -0,0 +1,86 @@
+from collections import defaultdict
+
+from p2_meshindex import mesh_locator
+from p2_oracle import mesh_graph, shortest_path_tree
+from p2_pathfinder import entry_points, funnel_path
+
+
+def flow_field(mesh, destination_box, source_boxes=None):
+    """ Computes, for boxes of a mesh, the next box on a shortest route toward destination_box.
+
+    A single search grows outward from the destination, so every agent heading there can read its route from
+    the field. With a DistanceOracle in mesh['oracle'], the field is the oracle's next-hop row and nothing is
+    searched.
+
+    Args:
+        mesh: A mesh dictionary with 'boxes' and 'adj'.
+        destination_box: The box the routes lead to.
+        source_boxes: If provided, the boxes routes are needed from; the search stops once they are all settled.
+
+    Returns:
+        A function mapping a box to the list of boxes of its route to destination_box, or None if there is none.
+
+    """
+    oracle = mesh.get('oracle')
+    if oracle is not None:
+        return lambda box: oracle.box_path(box, destination_box)
+
+    boxes, index, edges = mesh_graph(mesh)
+    targets = None if source_boxes is None else [index[box] for box in source_boxes]
+    _, parents = shortest_path_tree(edges, index[destination_box], targets)
+
+    def route(box):
+        current = index[box]
+        if current not in parents:
+            return None
+
+        path = [box]
+        while parents[current] != current:
+            current = parents[current]
+            path.append(boxes[current])
+        return path
+
+    return route
+
+
+def find_paths(queries, mesh, smooth=True):
+    """ Finds a path for each of many (source_point, destination_point) queries, such as a crowd of agents.
+
+    Queries are grouped by the box holding their destination, and a single flow_field is computed per distinct
+    destination box, so the number of searches grows with the number of destinations rather than agents.
+    Routes run between box centers, which makes them the same as the ones a DistanceOracle would give.
+
+    Args:
+        queries: A list of (source_point, destination_point) pairs.
+        mesh: A mesh dictionary with 'boxes' and 'adj'.
+        smooth: Whether to pull each path taut through its boxes with funnel_path.
+
+    Returns:
+        A list holding the path (list of points) of each query in order, empty where there is no path.
+
+    """
+    locator = mesh_locator(mesh)
+    paths = [[] for _ in queries]
+
+    by_destination = defaultdict(list)
+    for i, (source_point, destination_point) in enumerate(queries):
+        source_box = locator.locate(source_point)
+        destination_box = locator.locate(destination_point)
+        if source_box is not None and destination_box is not None:
+            by_destination[destination_box].append((i, source_box))
+
+    for destination_box, agents in by_destination.items():
+        route = flow_field(mesh, destination_box, {source_box for _, source_box in agents})
+
+        for i, source_box in agents:
+            box_path = route(source_box)
+            if box_path is None:
+                continue
+
+            source_point, destination_point = queries[i]
+            if smooth:
+                paths[i] = funnel_path(source_point, destination_point, box_path)
+            else:
+                paths[i] = entry_points(source_point, destination_point, box_path)
+
+    return paths
@@ -1,23 +1,19 @@
 import sys
 import random
-import pickle
 import traceback
 import tkinter
 
 import p2_pathfinder
+from p2_meshfile import load_mesh
 
 if len(sys.argv) != 4:
-    print("usage: %s map.gif map.mesh.pickle subsample_factor" % sys.argv[0])
+    print("usage: %s map.gif map.mesh.pickle|map.mesh.bin subsample_factor" % sys.argv[0])
     sys.exit(-1)
 
 _, MAP_FILENAME, MESH_FILENAME, SUBSAMPLE = sys.argv
 SUBSAMPLE = int(SUBSAMPLE)
 
-with open(MESH_FILENAME, 'rb') as f:
-  mesh = pickle.load(f)
-  #print(mesh.keys())
-  #print(mesh['boxes'])
-  #print(mesh['adj'])
+mesh = load_mesh(MESH_FILENAME)
 master = tkinter.Tk()
 
 big_image = tkinter.PhotoImage(file=MAP_FILENAME)
@@ -78,6 +74,8 @@ def on_click(event):
         destination_point = event.y*SUBSAMPLE, event.x*SUBSAMPLE
         try:
             path, visited_boxes = p2_pathfinder.find_path(source_point, destination_point, mesh)
+            if not path:
+                print("No path!")
 
         except:
             destination_point = None
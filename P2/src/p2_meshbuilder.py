@@ -1,4 +1,5 @@
 import collections
+from multiprocessing import Pool
 import pickle
 import sys
 import random
@@ -7,114 +8,202 @@ from matplotlib.pyplot import imread, imsave
 import numpy
 from numpy import zeros_like
 
+from p2_meshfile import save_mesh_binary
+from p2_meshindex import BoxGrid, mesh_locator
 
-def build_mesh(image, min_feature_size):
-    def scan(box):
 
-        x1, x2, y1, y2 = box
-        area = (x2 - x1) * (y2 - y1)
+def summed_area_table(mask):
+    """ Builds the integral image of a boolean mask.
 
-        if area < min_feature_size or (image[x1:x2, y1:y2] == 255).all() or (image[x1:x2, y1:y2] == 0).all():
+    table[x, y] holds the number of true pixels in mask[:x, :y], so the table has one more row and column
+    than the mask and the count over any box takes four lookups (see box_count).
 
-            # this box is simple enough to handle in one node
-            if (image[x1:x2, y1:y2] == 255).all():
-                return [box], []
-            else:
-                return [], []
+    """
+    table = numpy.zeros((mask.shape[0] + 1, mask.shape[1] + 1), dtype=numpy.uint32)
+    numpy.cumsum(numpy.cumsum(mask, axis=0, dtype=numpy.uint32), axis=1, out=table[1:, 1:])
+    return table
 
-        else:
 
-            # recursively split this big box on the longest dimension
-            if x2 - x1 > y2 - y1:
+def box_count(table, box):
+    """ Counts the true pixels of a mask inside box, given the summed_area_table of the mask. """
+    x1, x2, y1, y2 = box
+    # each difference is a count over a strip of rows, so neither can underflow the unsigned table
+    return int((table[x2, y2] - table[x1, y2]) - (table[x2, y1] - table[x1, y1]))
 
-                cut = int(x1 + (x2 - x1) / 2 + 1)
-                first_box = (x1, cut, y1, y2)
-                second_box = (cut, x2, y1, y2)
 
-                def rank(b): return (b[2], b[3])
+def split_box(box):
+    """ Splits a box in two across its longest dimension.
 
-                def first_touch(b): return b[1] == cut
+    Returns:
+        The first and second halves, the axis of the cut (0 for a cut across x, 1 for a cut across y), and the
+        coordinate of the cut along that axis.
 
-                def second_touch(b): return b[0] == cut
+    """
+    x1, x2, y1, y2 = box
 
-            else:
+    if x2 - x1 > y2 - y1:
+        cut = int(x1 + (x2 - x1) / 2 + 1)
+        return (x1, cut, y1, y2), (cut, x2, y1, y2), 0, cut
 
-                cut = int(y1 + (y2 - y1) / 2 + 1)
-                first_box = (x1, x2, y1, cut)
-                second_box = (x1, x2, cut, y2)
+    cut = int(y1 + (y2 - y1) / 2 + 1)
+    return (x1, x2, y1, cut), (x1, x2, cut, y2), 1, cut
 
-                def rank(b): return (b[0], b[1])
 
-                def first_touch(b): return b[3] == cut
+def merge_halves(first_boxes, first_edges, second_boxes, second_edges, axis, cut):
+    """ Joins the meshes of the two sides of a cut into one mesh.
 
-                def second_touch(b): return b[2] == cut
+    Boxes touching the cut from either side are walked in order along it. A pair spanning exactly the same
+    range is fused into one box, replacing both in the edges of their sides, and any other overlapping pair
+    gains an edge.
 
-            first_boxes, first_edges = scan(first_box)
-            second_boxes, second_edges = scan(second_box)
+    Args:
+        first_boxes, first_edges: The boxes and edges on the low side of the cut.
+        second_boxes, second_edges: The boxes and edges on the high side of the cut.
+        axis: 0 if the cut is across x, 1 if it is across y.
+        cut: The coordinate of the cut along that axis.
 
-            my_boxes = []
-            my_edges = []
+    Returns:
+        The boxes and the edges of the joined mesh.
+
+    """
+    if axis == 0:
+        def rank(b): return (b[2], b[3])
+
+        def first_touch(b): return b[1] == cut
+
+        def second_touch(b): return b[0] == cut
+
+    else:
+        def rank(b): return (b[0], b[1])
 
-            my_boxes.extend([fb for fb in first_boxes if not first_touch(fb)])
-            my_boxes.extend(
-                [sb for sb in second_boxes if not second_touch(sb)])
+        def first_touch(b): return b[3] == cut
 
-            first_touches = sorted(filter(first_touch, first_boxes), key=rank)
-            second_touches = sorted(
-                filter(second_touch, second_boxes), key=rank)
+        def second_touch(b): return b[2] == cut
 
-            first_merges = {}
-            second_merges = {}
+    my_boxes = [fb for fb in first_boxes if not first_touch(fb)]
+    my_boxes.extend([sb for sb in second_boxes if not second_touch(sb)])
+    my_edges = []
 
-            while first_touches and second_touches:
+    first_touches = sorted(filter(first_touch, first_boxes), key=rank)
+    second_touches = sorted(filter(second_touch, second_boxes), key=rank)
 
-                f, s = first_touches[0], second_touches[0]
-                rf, rs = rank(f), rank(s)
+    first_merges = {}
+    second_merges = {}
 
-                if rf == rs:
+    # walk both sides with an index each, rather than popping from the front of the lists
+    i = j = 0
+    while i < len(first_touches) and j < len(second_touches):
 
-                    first_touches.pop(0)
-                    second_touches.pop(0)
-                    merged = (f[0], s[1], f[2], s[3])
-                    first_merges[f] = merged
-                    second_merges[s] = merged
-                    my_boxes.append(merged)
+        f, s = first_touches[i], second_touches[j]
+        rf, rs = rank(f), rank(s)
 
-                elif rf[1] < rs[1]:
+        if rf == rs:
 
-                    my_boxes.append(first_touches.pop(0))
-                    if rf[1] >= rs[0]:
-                        my_edges.append((f, s))
+            i += 1
+            j += 1
+            merged = (f[0], s[1], f[2], s[3])
+            first_merges[f] = merged
+            second_merges[s] = merged
+            my_boxes.append(merged)
 
-                elif rf[1] > rs[1]:
+        elif rf[1] < rs[1]:
+
+            i += 1
+            my_boxes.append(f)
+            if rf[1] >= rs[0]:
+                my_edges.append((f, s))
+
+        elif rf[1] > rs[1]:
+
+            j += 1
+            my_boxes.append(s)
+            if rf[0] <= rs[1]:
+                my_edges.append((f, s))
+
+        else:
+
+            i += 1
+            j += 1
+            my_boxes.append(f)
+            my_boxes.append(s)
+            my_edges.append((f, s))
+
+    my_boxes.extend(first_touches[i:])
+    my_boxes.extend(second_touches[j:])
+
+    for edges, merges in ((first_edges, first_merges), (second_edges, second_merges)):
+        if merges:
+            my_edges.extend([(merges.get(a, a), merges.get(b, b)) for a, b in edges])
+        else:
+            my_edges.extend(edges)
 
-                    my_boxes.append(second_touches.pop(0))
-                    if rf[0] <= rs[1]:
-                        my_edges.append((f, s))
+    return my_boxes, my_edges
 
-                else:
 
-                    my_boxes.append(first_touches.pop(0))
-                    my_boxes.append(second_touches.pop(0))
-                    my_edges.append((f, s))
+def build_boxes(image, min_feature_size, origin=(0, 0)):
+    """ Decomposes an image into free boxes and the edges between touching boxes.
 
-            my_boxes.extend(first_touches)
-            my_boxes.extend(second_touches)
+    Args:
+        image: The map image, with free pixels 255 and blocked pixels 0.
+        min_feature_size: The area below which a box that is neither all free nor all blocked is dropped.
+        origin: The position of image[0, 0] in the coordinates of the returned boxes, for building part of a
+            larger map from a slice of it.
 
-            for a, b in first_edges:
-                my_edges.append(
-                    (first_merges.get(a, a), first_merges.get(b, b)))
+    Returns:
+        The list of boxes and the list of edges, as pairs of boxes.
 
-            for a, b in second_edges:
-                my_edges.append(
-                    (second_merges.get(a, a), second_merges.get(b, b)))
+    """
+    free = summed_area_table(image == 255)
+    blocked = summed_area_table(image == 0)
+    ox, oy = origin
 
-            return my_boxes, my_edges
+    # Boxes are split depth first with an explicit stack, so long thin maps cannot exhaust the recursion limit.
+    # A box is pushed once to be scanned (split is None) and, if it was split, once more to merge its halves,
+    # whose meshes are then the top two entries of results.
+    stack = [((ox, ox + image.shape[0], oy, oy + image.shape[1]), None)]
+    results = []
 
-            # end of scan
+    while stack:
+        box, split = stack.pop()
 
-    boxes, edges = scan((0, image.shape[0], 0, image.shape[1]))
+        if split is not None:
+            second_boxes, second_edges = results.pop()
+            first_boxes, first_edges = results.pop()
+            results.append(merge_halves(first_boxes, first_edges, second_boxes, second_edges, *split))
+            continue
 
+        x1, x2, y1, y2 = box
+        area = (x2 - x1) * (y2 - y1)
+        local = (x1 - ox, x2 - ox, y1 - oy, y2 - oy)
+        all_free = box_count(free, local) == area
+
+        if area < min_feature_size or all_free or box_count(blocked, local) == area:
+
+            # this box is simple enough to handle in one node
+            results.append(([box], []) if all_free else ([], []))
+
+        else:
+
+            # split this big box on the longest dimension
+            first_box, second_box, axis, cut = split_box(box)
+            if first_box == box:
+                # a side of 2 pixels or fewer cannot be cut any smaller, so this mixed box is dropped
+                results.append(([], []))
+                continue
+            stack.append((box, (axis, cut)))
+            stack.append((second_box, None))
+            stack.append((first_box, None))
+
+    return results.pop()
+
+
+def build_mesh(image, min_feature_size):
+    boxes, edges = build_boxes(image, min_feature_size)
+    return mesh_from_edges(edges)
+
+
+def mesh_from_edges(edges):
+    """ Makes the mesh dictionary of the boxes with at least one edge. """
     adj = collections.defaultdict(list)
     for a, b in edges:
         adj[a].append(b)
@@ -125,25 +214,256 @@ def build_mesh(image, min_feature_size):
     return mesh
 
 
+def build_mesh_tiled(image, min_feature_size, tile_size=512, processes=None):
+    """ Builds the same mesh as build_mesh, decomposing tiles of the image in parallel.
+
+    The image is split exactly as build_mesh splits it, down to tiles no larger than tile_size on a side. Each
+    tile is decomposed by build_boxes in a process pool, and the tiles are then joined along their seams with
+    merge_halves, in the order build_mesh would have joined them.
+
+    Args:
+        image: The map image, with free pixels 255 and blocked pixels 0.
+        min_feature_size: As for build_mesh.
+        tile_size: The largest side of a tile handed to a worker.
+        processes: The number of worker processes, defaulting to the number of CPUs.
+
+    """
+    # plan the splits above the tiles, in the order build_boxes would make them
+    plan = []       # ('tile', box), ('leaf', (boxes, edges)) or ('merge', (axis, cut)), in post-order
+    stack = [((0, image.shape[0], 0, image.shape[1]), None)]
+    free = summed_area_table(image == 255)
+    blocked = summed_area_table(image == 0)
+
+    while stack:
+        box, split = stack.pop()
+
+        if split is not None:
+            plan.append(('merge', split))
+            continue
+
+        x1, x2, y1, y2 = box
+        if max(x2 - x1, y2 - y1) <= tile_size:
+            plan.append(('tile', box))
+            continue
+
+        area = (x2 - x1) * (y2 - y1)
+        all_free = box_count(free, box) == area
+
+        if area < min_feature_size or all_free or box_count(blocked, box) == area:
+            plan.append(('leaf', ([box], []) if all_free else ([], [])))
+        else:
+            first_box, second_box, axis, cut = split_box(box)
+            if first_box == box:
+                plan.append(('leaf', ([], [])))
+                continue
+            stack.append((box, (axis, cut)))
+            stack.append((second_box, None))
+            stack.append((first_box, None))
+
+    tiles = [box for step, box in plan if step == 'tile']
+    with Pool(processes, _init_worker, (image, min_feature_size)) as pool:
+        tile_results = iter(pool.map(_worker_tile, tiles))
+
+    results = []
+    for step, value in plan:
+        if step == 'tile':
+            results.append(next(tile_results))
+        elif step == 'leaf':
+            results.append(value)
+        else:
+            second_boxes, second_edges = results.pop()
+            first_boxes, first_edges = results.pop()
+            results.append(merge_halves(first_boxes, first_edges, second_boxes, second_edges, *value))
+
+    boxes, edges = results.pop()
+    return mesh_from_edges(edges)
+
+
+_image = None
+_min_feature_size = None
+
+
+def _init_worker(image, min_feature_size):
+    global _image, _min_feature_size
+    _image = image
+    _min_feature_size = min_feature_size
+
+
+def _worker_tile(box):
+    x1, x2, y1, y2 = box
+    return build_boxes(_image[x1:x2, y1:y2], _min_feature_size, (x1, y1))
+
+
+def touching(a, b):
+    """ Returns whether two boxes share part of an edge or a corner without overlapping. """
+    if max(a[0], b[0]) > min(a[1], b[1]) or max(a[2], b[2]) > min(a[3], b[3]):
+        return False
+    return a[1] == b[0] or b[1] == a[0] or a[3] == b[2] or b[3] == a[2]
+
+
+def subtract_box(box, cut_out):
+    """ Returns the up to four boxes covering the part of box outside of the box cut_out. """
+    x1, x2, y1, y2 = box
+    cx1, cx2, cy1, cy2 = max(x1, cut_out[0]), min(x2, cut_out[1]), max(y1, cut_out[2]), min(y2, cut_out[3])
+    if cx1 >= cx2 or cy1 >= cy2:
+        return [box]
+
+    pieces = [(x1, cx1, y1, y2), (cx2, x2, y1, y2), (cx1, cx2, y1, cy1), (cx1, cx2, cy2, y2)]
+    return [(px1, px2, py1, py2) for px1, px2, py1, py2 in pieces if px1 < px2 and py1 < py2]
+
+
+def split_node(image, box, min_feature_size):
+    """ Finds the smallest box that build_boxes decomposes on its own and that contains box.
+
+    build_boxes splits the image the same way whatever its content, down to boxes that are all free, all blocked
+    or smaller than min_feature_size. The returned box is the smallest box of that split tree containing box
+    whose ancestors are all split in image, so building it alone gives what build_boxes gives inside it.
+
+    """
+    x1, x2, y1, y2 = box
+    region = image[x1:x2, y1:y2]
+    # when box itself is mixed, so is every box containing it
+    mixed = not ((region == 255).all() or (region == 0).all())
+
+    node = (0, image.shape[0], 0, image.shape[1])
+    while True:
+        nx1, nx2, ny1, ny2 = node
+        if (nx2 - nx1) * (ny2 - ny1) < min_feature_size:
+            return node
+        if not mixed:
+            region = image[nx1:nx2, ny1:ny2]
+            if (region == 255).all() or (region == 0).all():
+                return node
+
+        first_box, second_box, axis, cut = split_box(node)
+        if first_box == node:
+            return node
+        for child in (first_box, second_box):
+            if child[0] <= x1 and x2 <= child[1] and child[2] <= y1 and y2 <= child[3]:
+                node = child
+                break
+        else:
+            return node
+
+
+def patch_mesh(mesh, image, dirty, min_feature_size):
+    """ Rebuilds the part of a mesh covering a changed rectangle of its image.
+
+    Free pixels next to walls often belong to no box, since build_boxes drops small mixed boxes, so rebuilding
+    only the changed rectangle can leave an opened door touching nothing. Instead the smallest box of the
+    split tree containing the rectangle (see split_node) is decomposed again from the image, and the boxes
+    overlapping it are removed. Whatever the removed boxes covered outside it is refilled with whole boxes.
+    The new boxes are then connected to each other across these pieces and to the old boxes they touch. A
+    rectangle crossing one of the first cuts of the image therefore rebuilds much of the mesh.
+
+    The mesh is updated in place: a cached locator is kept up to date, and a cached box graph or distance
+    oracle, which would be stale, is dropped.
+
+    Args:
+        mesh: A mesh dictionary built by build_mesh or unpickled (not a read-only binary mesh).
+        image: The updated map image.
+        dirty: The changed (x1, x2, y1, y2) rectangle of the image.
+        min_feature_size: The min_feature_size the mesh was built with.
+
+    Returns:
+        The list of removed boxes and the list of added boxes, for invalidating anything cached about them.
+
+    """
+    locator = mesh_locator(mesh)
+    if not locator.covers(image.shape):
+        # the locator only spans the boxes it was built from, and new boxes may now fill any part of the image
+        locator = mesh['locator'] = BoxGrid(mesh['boxes'], locator.cell_size, image.shape)
+    x1, x2, y1, y2 = dirty
+    dirty = (max(x1, 0), min(x2, image.shape[0]), max(y1, 0), min(y2, image.shape[1]))
+    if dirty[0] >= dirty[1] or dirty[2] >= dirty[3]:
+        return [], []
+    node = split_node(image, dirty, min_feature_size)
+
+    removed = locator.overlapping(node)
+
+    # a box nested in another (see merge_halves) needs no refilling of its own
+    outermost = [box for box in removed
+                 if not any(other != box and other[0] <= box[0] and box[1] <= other[1] and other[2] <= box[2]
+                            and box[3] <= other[3] for other in removed)]
+    pieces = [node] + [piece for box in outermost for piece in subtract_box(box, node)]
+
+    boxes = []
+    edges = []
+    piece_of = {}
+    for i, (px1, px2, py1, py2) in enumerate(pieces):
+        piece_boxes, piece_edges = build_boxes(image[px1:px2, py1:py2], min_feature_size, (px1, py1))
+        boxes.extend(piece_boxes)
+        edges.extend(piece_edges)
+        piece_of.update((box, i) for box in piece_boxes)
+
+    adj = mesh['adj']
+    removed_set = set(removed)
+    for box in removed:
+        for neighbor in adj.pop(box, []):
+            if neighbor not in removed_set:
+                adj[neighbor] = [b for b in adj[neighbor] if b != box]
+        locator.discard(box)
+
+    for box in boxes:
+        locator.add(box)
+
+    # connect new boxes to old boxes around them, and to new boxes in other pieces once per pair
+    for box in boxes:
+        for other in locator.overlapping(box, closed=True):
+            if other in piece_of and (piece_of[other] == piece_of[box] or other < box):
+                continue
+            if touching(box, other):
+                edges.append((box, other))
+
+    new = set()
+    for a, b in edges:
+        for box, other in ((a, b), (b, a)):
+            if box not in adj:
+                adj[box] = []
+                new.add(box)
+            adj[box].append(other)
+
+    # in the order the locator was given them, so that it picks the same one of several nested boxes as a
+    # locator built from the mesh
+    added = [box for box in dict.fromkeys(boxes) if box in new]
+    mesh['boxes'] = [box for box in mesh['boxes'] if box not in removed_set] + added
+
+    # like build_mesh, keep only boxes with neighbors
+    for box in boxes:
+        if box not in adj:
+            locator.discard(box)
+
+    mesh.pop('graph', None)
+    mesh.pop('oracle', None)
+
+    return removed, added
+
+
 if __name__ == '__main__':
 
     min_feature_size = 16
+    processes = None
     filename = None
 
     if len(sys.argv) == 2:
         filename = sys.argv[1]
-    elif len(sys.argv) == 3:
+    elif len(sys.argv) in (3, 4):
         filename = sys.argv[1]
         min_feature_size = int(sys.argv[2])
+        if len(sys.argv) == 4:
+            processes = int(sys.argv[3])
     else:
-        print("usage: %s map_filename min_feature_size" % sys.argv[0])
+        print("usage: %s map_filename min_feature_size [processes]" % sys.argv[0])
         sys.exit(-1)
 
     img = (imread(filename) * 255).astype(dtype=numpy.uint8)
     if len(img.shape) > 2:
         img = img[:, :, 0]
 
-    mesh = build_mesh(img, min_feature_size)
+    if processes:
+        mesh = build_mesh_tiled(img, min_feature_size, processes=processes)
+    else:
+        mesh = build_mesh(img, min_feature_size)
 
     print(type(mesh))
     print(mesh.keys())
@@ -151,6 +471,8 @@ if __name__ == '__main__':
     with open(filename + '.mesh.pickle', 'wb') as f:
         pickle.dump(mesh, f, protocol=pickle.HIGHEST_PROTOCOL)
 
+    save_mesh_binary(mesh, filename + '.mesh.bin')
+
     atlas = zeros_like(img)
     for x1, x2, y1, y2 in mesh['boxes']:
         atlas[x1:x2, y1:y2] = random.randint(64, 255)
@@ -0,0 +1,177 @@
+import pickle
+import struct
+from collections.abc import Mapping, Sequence
+
+import numpy
+
+# A binary mesh file holds a 32 byte header, then the boxes as int32 (x1, x2, y1, y2) rows in the mesh's order,
+# then a uint32 permutation listing the box indices in sorted box order, then the adjacency in compressed sparse
+# row form: for box i, its neighbors are the box indices neighbors[offsets[i]:offsets[i + 1]]. The boxes keep the
+# mesh's order because BoxGrid.locate picks the last of several nested boxes. All values are little-endian.
+MESH_MAGIC = b'P2MESH\0\0'
+MESH_VERSION = 2
+HEADER = struct.Struct('<8sII2Q')     # magic, version, reserved, number of boxes, number of neighbor entries
+
+
+class MeshBoxes(Sequence):
+    """ The boxes of a binary mesh in the mesh's order, as (x1, x2, y1, y2) tuples built only when accessed. """
+
+    def __init__(self, array, order):
+        self.array = array      # int32 array with one (x1, x2, y1, y2) row per box
+        self.order = order      # uint32 array of box indices, sorted by box
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [tuple(row) for row in self.array[i].tolist()]
+        return tuple(self.array[i].tolist())
+
+    def __iter__(self):
+        # converting the whole array at once is far faster than one row per step
+        return iter([tuple(row) for row in self.array.tolist()])
+
+    def index(self, box):
+        """ Returns the index of box by binary search, raising ValueError if the mesh does not have it. """
+        box = tuple(box)
+        array, order = self.array, self.order
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if tuple(array[order[mid]].tolist()) < box:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(order) and tuple(array[order[lo]].tolist()) == box:
+            return int(order[lo])
+        raise ValueError('%r is not a box of the mesh' % (box,))
+
+    def __contains__(self, box):
+        try:
+            self.index(box)
+        except ValueError:
+            return False
+        return True
+
+
+class MeshAdjacency(Mapping):
+    """ Maps each box of a binary mesh to the list of its neighboring boxes, like the 'adj' of a built mesh.
+
+    Neighbor lists are read through box indices and kept once built, so a search over a binary mesh soon runs
+    as fast as over a built one. The lists are shared and must not be modified.
+
+    """
+
+    def __init__(self, boxes, offsets, neighbors):
+        self.boxes = boxes              # MeshBoxes
+        self.offsets = offsets          # uint32 array, neighbors of box i start at offsets[i]
+        self.neighbors = neighbors      # uint32 array of neighbor box indices
+        self.indices = {}               # box -> index, for every box handed out as a neighbor so far
+        self.lists = {}                 # box -> list of neighbors, for every box whose neighbors were read
+
+        # memoryviews of the same buffers, which read a few values much faster than indexing numpy arrays
+        self._offsets = memoryview(offsets)
+        self._neighbors = memoryview(neighbors)
+        self._coordinates = memoryview(boxes.array.reshape(-1))
+
+    def neighbor_indices(self, i):
+        """ Returns the indices of the neighbors of the box with index i. """
+        return self.neighbors[self.offsets[i]:self.offsets[i + 1]]
+
+    def __getitem__(self, box):
+        try:
+            return self.lists[box]
+        except (KeyError, TypeError):
+            pass
+
+        # a search asks for the neighbors of boxes it was given as neighbors, so their indices are remembered
+        # rather than binary searched for again
+        try:
+            i = self.indices[box]
+        except (KeyError, TypeError):
+            try:
+                i = self.boxes.index(box)
+            except (ValueError, TypeError):
+                raise KeyError(box)
+
+        indices = self._neighbors[self._offsets[i]:self._offsets[i + 1]].tolist()
+        coordinates = self._coordinates
+        found = self.lists[tuple(box)] = [tuple(coordinates[4 * j:4 * j + 4].tolist()) for j in indices]
+        self.indices.update(zip(found, indices))
+        return found
+
+    def __iter__(self):
+        return iter(self.boxes)
+
+    def __len__(self):
+        return len(self.boxes)
+
+
+def save_mesh_binary(mesh, filename):
+    """ Saves a mesh in the binary format read by load_mesh_binary.
+
+    Args:
+        mesh: A mesh dictionary with 'boxes' and 'adj', as built by p2_meshbuilder.build_mesh.
+        filename: The name of the file to be created, conventionally ending in '.mesh.bin'.
+
+    """
+    boxes = list(mesh['boxes'])
+    index = {box: i for i, box in enumerate(boxes)}
+    order = sorted(range(len(boxes)), key=boxes.__getitem__)
+
+    neighbors = [index[neighbor] for box in boxes for neighbor in mesh['adj'].get(box, [])]
+    offsets = numpy.zeros(len(boxes) + 1, dtype='<u4')
+    numpy.cumsum([len(mesh['adj'].get(box, [])) for box in boxes], out=offsets[1:])
+
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MESH_MAGIC, MESH_VERSION, 0, len(boxes), len(neighbors)))
+        f.write(numpy.array(boxes, dtype='<i4').reshape(len(boxes), 4).tobytes())
+        f.write(numpy.array(order, dtype='<u4').tobytes())
+        f.write(offsets.tobytes())
+        f.write(numpy.array(neighbors, dtype='<u4').tobytes())
+
+
+def load_mesh_binary(filename):
+    """ Maps a binary mesh file into memory without unpickling or building a tuple per box.
+
+    Returns:
+        A mesh dictionary whose 'boxes' is a MeshBoxes sequence and whose 'adj' is a MeshAdjacency mapping,
+        both read from the file on demand. Their arrays are views of a numpy memmap of the file.
+
+    """
+    with open(filename, 'rb') as f:
+        magic, version, _, box_count, neighbor_count = HEADER.unpack(f.read(HEADER.size))
+
+    if magic != MESH_MAGIC:
+        raise ValueError('%s is not a binary mesh file' % filename)
+    if version != MESH_VERSION:
+        raise ValueError('%s has mesh format version %d, expected %d' % (filename, version, MESH_VERSION))
+
+    offset = HEADER.size
+    box_array = _map(filename, '<i4', offset, (box_count, 4))
+    offset += box_array.nbytes
+    order = _map(filename, '<u4', offset, (box_count,))
+    offset += order.nbytes
+    offsets = _map(filename, '<u4', offset, (box_count + 1,))
+    offset += offsets.nbytes
+    neighbors = _map(filename, '<u4', offset, (neighbor_count,))
+
+    boxes = MeshBoxes(box_array, order)
+    return {'boxes': boxes, 'adj': MeshAdjacency(boxes, offsets, neighbors)}
+
+
+def _map(filename, dtype, offset, shape):
+    if not numpy.prod(shape):
+        return numpy.zeros(shape, dtype=dtype)     # memmap cannot map zero bytes
+    # a plain array view of the map indexes without the per-access overhead of the memmap subclass
+    return numpy.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=shape).view(numpy.ndarray)
+
+
+def load_mesh(filename):
+    """ Loads a mesh saved either as a pickle ('.pickle') or in the binary format (any other extension). """
+    if filename.endswith('.pickle'):
+        with open(filename, 'rb') as f:
+            return pickle.load(f)
+
+    return load_mesh_binary(filename)
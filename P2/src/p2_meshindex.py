@@ -0,0 +1,123 @@
+from math import sqrt
+
+import numpy
+
+
+class BoxGrid:
+    def __init__(self, boxes, cell_size=None, shape=None):
+        """ Buckets the boxes of a mesh into a uniform grid so that the box containing a point is found in O(1).
+
+        Each bucket lists the boxes overlapping its square of cell_size by cell_size pixels, so a lookup only
+        tests the few boxes in the point's bucket instead of every box of the mesh. The buckets are computed
+        with array operations over all the boxes at once, straight from the int32 array of a binary mesh.
+
+        Args:
+            boxes: The (x1, x2, y1, y2) boxes of a mesh, such as mesh['boxes'].
+            cell_size: The side of a bucket in pixels. By default it is the side of the mesh's mean box, which
+                keeps both the number of buckets and the boxes per bucket proportional to the number of boxes.
+            shape: The (x, y) extent of the area the grid covers, such as the shape of the map image, so that
+                boxes added later anywhere in it can be located. By default it is the extent of the boxes.
+
+        """
+        array = numpy.asarray(getattr(boxes, 'array', boxes), dtype=numpy.int64).reshape(-1, 4)
+        boxes = [tuple(box) for box in array.tolist()]
+        x1, x2, y1, y2 = array.T
+
+        if cell_size is None:
+            area = int(((x2 - x1) * (y2 - y1)).sum())
+            cell_size = max(1, int(sqrt(area / len(boxes)))) if boxes else 1
+
+        self.cell_size = cell_size
+        width, height = shape if shape is not None else (0, 0)
+        self.rows = -(-max(int(x2.max(initial=0)), width) // cell_size)
+        self.columns = -(-max(int(y2.max(initial=0)), height) // cell_size)
+
+        # the rows and columns of buckets each box spans, none for an empty box since it contains no point
+        first_rows, first_columns = x1 // cell_size, y1 // cell_size
+        row_counts = numpy.where(x1 < x2, (x2 - 1) // cell_size + 1 - first_rows, 0)
+        column_counts = numpy.where(y1 < y2, (y2 - 1) // cell_size + 1 - first_columns, 0)
+        counts = row_counts * column_counts
+
+        # one (bucket, box) pair per bucket a box spans, sorted by bucket while keeping the boxes in mesh order
+        owners = numpy.repeat(numpy.arange(len(boxes)), counts)
+        steps = numpy.arange(len(owners)) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+        widths = numpy.maximum(column_counts, 1)[owners]
+        buckets = (first_rows[owners] + steps // widths) * self.columns + first_columns[owners] + steps % widths
+        order = numpy.argsort(buckets, kind='stable')
+        bounds = numpy.searchsorted(buckets[order], numpy.arange(self.rows * self.columns + 1)).tolist()
+        members = [boxes[i] for i in owners[order].tolist()]
+
+        self.buckets = [members[start:end] for start, end in zip(bounds, bounds[1:])]      # row-major
+
+    def _bucket_range(self, box, closed=False):
+        """ Returns the rows and columns of the buckets holding pixels of box, and of its border if closed. """
+        x1, x2, y1, y2 = box
+        pad = 1 if closed else 0
+        rows = range(max((x1 - pad) // self.cell_size, 0), min((x2 - 1 + pad) // self.cell_size + 1, self.rows))
+        columns = range(max((y1 - pad) // self.cell_size, 0),
+                        min((y2 - 1 + pad) // self.cell_size + 1, self.columns))
+        return rows, columns
+
+    def covers(self, shape):
+        """ Returns whether the grid covers an area of the given (x, y) extent, so that its boxes can be added. """
+        return self.rows * self.cell_size >= shape[0] and self.columns * self.cell_size >= shape[1]
+
+    def add(self, box):
+        """ Adds a box, which must lie within the area the grid covers (see covers). """
+        x1, x2, y1, y2 = box
+        if x1 >= x2 or y1 >= y2:
+            return      # an empty box contains no point
+        rows, columns = self._bucket_range(box)
+        for row in rows:
+            for column in columns:
+                self.buckets[row * self.columns + column].append(box)
+
+    def discard(self, box):
+        """ Removes a box if the grid holds it. """
+        rows, columns = self._bucket_range(box)
+        for row in rows:
+            for column in columns:
+                bucket = self.buckets[row * self.columns + column]
+                if box in bucket:
+                    bucket.remove(box)
+
+    def overlapping(self, region, closed=False):
+        """ Returns the boxes sharing pixels with region, or also touching its border or corners if closed. """
+        x1, x2, y1, y2 = region
+        rows, columns = self._bucket_range(region, closed)
+        found = {}
+        for row in rows:
+            for box in (box for column in columns for box in self.buckets[row * self.columns + column]):
+                if closed:
+                    if max(x1, box[0]) <= min(x2, box[1]) and max(y1, box[2]) <= min(y2, box[3]):
+                        found[box] = None
+                elif max(x1, box[0]) < min(x2, box[1]) and max(y1, box[2]) < min(y2, box[3]):
+                    found[box] = None
+        return list(found)
+
+    def locate(self, point):
+        """ Returns the box containing point, with x1 <= x < x2 and y1 <= y < y2, or None if no box does.
+
+        If boxes overlap, the one latest in the mesh's box order is returned, as a linear scan would.
+
+        """
+        x, y = point
+        row, column = int(x // self.cell_size), int(y // self.cell_size)
+        if not (0 <= row < self.rows and 0 <= column < self.columns):
+            return None
+
+        found = None
+        for box in self.buckets[row * self.columns + column]:
+            x1, x2, y1, y2 = box
+            if x1 <= x < x2 and y1 <= y < y2:
+                found = box
+
+        return found
+
+
+def mesh_locator(mesh):
+    """ Returns the BoxGrid of a mesh, building it on first use and keeping it in mesh['locator']. """
+    locator = mesh.get('locator')
+    if locator is None:
+        locator = mesh['locator'] = BoxGrid(mesh['boxes'])
+    return locator
@@ -0,0 +1,208 @@
+from heapq import heappop, heappush
+from math import hypot, inf
+from multiprocessing import Pool
+
+import numpy
+
+# Default bound on the size of an oracle's tables, beyond which meshes are left to live search
+DEFAULT_MAX_BYTES = 256 * 2 ** 20
+
+
+class DistanceOracle:
+    def __init__(self, boxes, next_hop, dist):
+        """ Answers box-to-box routes on a mesh from precomputed tables, as built by build_oracle.
+
+        Args:
+            boxes: The boxes of the mesh, in the order indexing the tables.
+            next_hop: An unsigned integer matrix where next_hop[d, b] is the index of the box following box b
+                on a shortest route to box d, or the largest value of its type if d cannot be reached.
+            dist: A float32 matrix of the route lengths between boxes, inf where unreachable.
+
+        """
+        self.boxes = [tuple(box) for box in boxes]
+        self.index = {box: i for i, box in enumerate(self.boxes)}
+        self.next_hop = next_hop
+        self.dist = dist
+        self.unreachable = numpy.iinfo(next_hop.dtype).max
+
+    def distance(self, box, destination_box):
+        """ Returns the length of the shortest route between the centers of two boxes, inf if there is none. """
+        return float(self.dist[self.index[destination_box], self.index[box]])
+
+    def box_path(self, box, destination_box):
+        """ Returns the boxes of a shortest route from box to destination_box, or None if there is none.
+
+        The route is read by following the next-hop table, in time linear in its length.
+
+        """
+        current, destination = self.index[box], self.index[destination_box]
+        hops = self.next_hop[destination]
+        path = [box]
+
+        while current != destination:
+            current = int(hops[current])
+            if current == self.unreachable:
+                return None
+            path.append(self.boxes[current])
+
+        return path
+
+
+def oracle_bytes(box_count):
+    """ Returns the size of the tables build_oracle would allocate for a mesh of box_count boxes. """
+    hop_bytes = 2 if box_count < 2 ** 16 - 1 else 4
+    return box_count * box_count * (hop_bytes + 4)
+
+
+def box_graph(mesh):
+    """ Numbers the boxes of a mesh and lists the neighbors of each by index.
+
+    Returns:
+        The list of boxes, a dictionary mapping each box to its index, and for each box a list of
+        (neighbor index, distance between centers) pairs.
+
+    """
+    boxes = [tuple(box) for box in mesh['boxes']]
+    index = {box: i for i, box in enumerate(boxes)}
+    centers = [((x1 + x2) / 2, (y1 + y2) / 2) for x1, x2, y1, y2 in boxes]
+
+    adj = mesh['adj']
+    if hasattr(adj, 'neighbor_indices'):
+        # a binary mesh lists neighbors by index already
+        flat, offsets = adj.neighbors.tolist(), adj.offsets.tolist()
+        neighbors = (flat[offsets[i]:offsets[i + 1]] for i in range(len(boxes)))
+    else:
+        neighbors = ([index[neighbor] for neighbor in adj.get(box, []) if neighbor in index] for box in boxes)
+
+    edges = []
+    for (cx, cy), indices in zip(centers, neighbors):
+        edges.append([(j, hypot(cx - centers[j][0], cy - centers[j][1])) for j in indices])
+
+    return boxes, index, edges
+
+
+def mesh_graph(mesh):
+    """ Returns the box_graph of a mesh, building it on first use and keeping it in mesh['graph']. """
+    graph = mesh.get('graph')
+    if graph is None:
+        graph = mesh['graph'] = box_graph(mesh)
+    return graph
+
+
+def build_oracle(mesh, max_bytes=DEFAULT_MAX_BYTES, processes=None):
+    """ Computes the distance and next-hop tables between every pair of boxes of a mesh.
+
+    Routes are measured between box centers. One Dijkstra search runs from each box; since routes are
+    symmetric, the search tree rooted at a box gives the next hop from every other box toward it.
+
+    Args:
+        mesh: A mesh dictionary with 'boxes' and 'adj'.
+        max_bytes: The largest size the tables may take. Larger meshes get no oracle.
+        processes: If provided, the number of worker processes to spread the searches over.
+
+    Returns:
+        A DistanceOracle, or None if the tables would exceed max_bytes.
+
+    """
+    boxes, _, edges = box_graph(mesh)
+    if oracle_bytes(len(boxes)) > max_bytes:
+        return None
+
+    hop_type = numpy.uint16 if len(boxes) < 2 ** 16 - 1 else numpy.uint32
+    next_hop = numpy.full((len(boxes), len(boxes)), numpy.iinfo(hop_type).max, dtype=hop_type)
+    dist = numpy.full((len(boxes), len(boxes)), inf, dtype=numpy.float32)
+
+    if processes:
+        with Pool(processes, _init_worker, (edges,)) as pool:
+            trees = pool.imap(_worker_tree, range(len(boxes)), chunksize=64)
+            for root, (costs, parents) in enumerate(trees):
+                _fill_row(next_hop, dist, root, costs, parents)
+    else:
+        for root in range(len(boxes)):
+            _fill_row(next_hop, dist, root, *shortest_path_tree(edges, root))
+
+    return DistanceOracle(boxes, next_hop, dist)
+
+
+def attach_oracle(mesh, max_bytes=DEFAULT_MAX_BYTES, processes=None):
+    """ Builds an oracle for a mesh and keeps it in mesh['oracle'], where find_path looks for it.
+
+    Returns:
+        The oracle, or None if the mesh is too big for max_bytes, in which case find_path keeps searching live.
+
+    """
+    oracle = build_oracle(mesh, max_bytes, processes)
+    if oracle is not None:
+        mesh['oracle'] = oracle
+    return oracle
+
+
+def save_oracle(oracle, filename, compressed=True):
+    """ Saves an oracle's tables to a numpy .npz file, compressed unless compressed is False. """
+    save = numpy.savez_compressed if compressed else numpy.savez
+    save(filename, boxes=numpy.array(oracle.boxes, dtype=numpy.int32).reshape(-1, 4), next_hop=oracle.next_hop,
+         dist=oracle.dist)
+
+
+def load_oracle(filename):
+    """ Loads an oracle saved by save_oracle. """
+    with numpy.load(filename) as data:
+        return DistanceOracle(data['boxes'].tolist(), data['next_hop'], data['dist'])
+
+
+def shortest_path_tree(edges, root, targets=None):
+    """ Runs Dijkstra's algorithm over a box_graph from the box with index root.
+
+    Since routes are symmetric, the tree also leads every reached box to root: parents[b] is the next box from
+    b toward root.
+
+    Args:
+        edges: The neighbor lists of a box_graph.
+        root: The index of the box the tree grows from.
+        targets: If provided, a collection of box indices; the search stops once all of them are settled.
+
+    Returns:
+        A dictionary of the costs of reached boxes and a dictionary of their parents, with root its own parent.
+
+    """
+    costs = {root: 0.}
+    parents = {root: root}
+    queue = [(0., root)]
+    remaining = set(targets) if targets is not None else None
+
+    while queue:
+        current_cost, current = heappop(queue)
+        if current_cost > costs[current]:
+            continue
+
+        if remaining is not None:
+            remaining.discard(current)
+            if not remaining:
+                break
+
+        for neighbor, weight in edges[current]:
+            pathcost = current_cost + weight
+            if pathcost < costs.get(neighbor, inf):
+                costs[neighbor] = pathcost
+                parents[neighbor] = current
+                heappush(queue, (pathcost, neighbor))
+
+    return costs, parents
+
+
+def _fill_row(next_hop, dist, root, costs, parents):
+    reached = numpy.fromiter(parents.keys(), dtype=numpy.int64, count=len(parents))
+    next_hop[root, reached] = numpy.fromiter(parents.values(), dtype=numpy.int64, count=len(parents))
+    dist[root, reached] = numpy.fromiter((costs[i] for i in parents), dtype=numpy.float64, count=len(parents))
+
+
+_edges = None
+
+
+def _init_worker(edges):
+    global _edges
+    _edges = edges
+
+
+def _worker_tree(root):
+    return shortest_path_tree(_edges, root)
@@ -1 +1,281 @@
-from heapq import heappop, heappushimport mathdef find_path (source_point, destination_point, mesh):    sourceBox = None    destinationBox = None    for box in mesh["boxes"]:        x1, x2, y1, y2 = box        sx, sy = source_point        dx, dy = destination_point        if x1 <= sx < x2 and y1 <= sy < y2:            #print("found source")            sourceBox = box        if x1 <= dx < x2 and y1 <= dy < y2:            #print("found destination")            destinationBox = box    path = []    boxes = {}    if destinationBox is None or sourceBox is None:        print('No Path')        return path, boxes.keys()    # bfs    queue = []    heappush(queue, (0, sourceBox, 'D'))    heappush(queue, (0, destinationBox, 'S'))    # S->D parent boxes    parent_forward = dict()    parent_forward[sourceBox] = None    # D->S parent boxes    parent_backward = dict()    parent_backward[destinationBox] = None    #S->D distances via boxes    distances_forward = dict()    distances_forward[sourceBox] = 0    # D->S distances via boxes    distances_backward = dict()    distances_backward[destinationBox] = 0    # S -> D points via boxes    points_forward = dict()    points_forward[sourceBox] = source_point    # D -> S points via boxes    points_backward = dict()    points_backward[destinationBox] = destination_point    while queue:        current_dist, current_box, curr_goal = heappop(queue)        if curr_goal == 'D':            current_point = points_forward[current_box]        else:            current_point = points_backward[current_box]        # print(current_box)        if (curr_goal == "D" and current_box in parent_backward) or (curr_goal == "S" and current_box in parent_forward):            s_d_curr = current_box            d_s_curr = current_box            while s_d_curr:                path.append(points_forward[s_d_curr])                if parent_forward[s_d_curr] is not None:                    if s_d_curr == parent_forward[parent_forward[s_d_curr]]:                        s_d_curr = parent_forward[s_d_curr]                        path.append(points_forward[s_d_curr])                        path.append(source_point)                        break                s_d_curr = parent_forward[s_d_curr]            path.reverse()            while d_s_curr:                path.append(points_backward[d_s_curr])                if parent_backward[d_s_curr] is not None:                    if d_s_curr == parent_backward[parent_backward[d_s_curr]]:                        d_s_curr = parent_backward[d_s_curr]                        path.append(points_backward[d_s_curr])                        path.append(destination_point)                        break                d_s_curr = parent_backward[d_s_curr]            break        else:            for adj in mesh["adj"][current_box]:                dx1, dx2, dy1, dy2 = adj                cx1, cx2, cy1, cy2 = current_box                line = []  # (x1, x2, y1, y2)                if cx1 == dx2:  # top                    if (dy2 - dy1) < (cy2 - cy1):  # destination is smaller                        line = [dx2, dx2, dy1, dy2]                    else:  # current is smaller                        line = [cx1, cx1, cy1, cy2]                elif cy1 == dy2:  # left                    if (dx2 - dx1) < (cx2 - cx1):  # destination is smaller                        line = [dx1, dx2, dy2, dy2]                    else:  # current is smaller                        line = [cx1, cx2, cy1, cy1]                elif cx2 == dx1:  # bottom                    if (dy2 - dy1) < (cy2 - cy1):  # destination is smaller                        line = [dx1, dx1, dy1, dy2]                    else:  # current is smaller                        line = [cx2, cx2, cy1, cy2]                elif cy2 == dy1:  # right                    if (dx2 - dx1) < (cx2 - cx1):  # destination is smaller                        line = [dx1, dx2, dy1, dy1]                    else:  # current is smaller                        line = [cx1, cx2, cy2, cy2]                        # print(line)                # calculate the line to L, R and mid                left_most = (line[0], line[2])                right_most = (line[1], line[3])                on_point = ()                if right_most[0] - left_most[0] == 0:  # x2 - x1 , horizontal                    if current_point[1] < left_most[1]:  # y < y1                        on_point = left_most                    elif current_point[1] > right_most[1]:                        on_point = right_most                    else:                        on_point = (right_most[0], current_point[1])                else:                    if current_point[0] < left_most[0]:  # x < x1                        on_point = left_most                    elif current_point[0] > right_most[0]:                        on_point = right_most                    else:                        on_point = (current_point[0], right_most[1])                dist = math.sqrt((current_point[0] - on_point[0]) ** 2 + (current_point[1] - on_point[1]) ** 2)  # calculates the distance                pathcost = current_dist + dist                if curr_goal == 'D':                    if (adj not in parent_forward) or (pathcost < distances_forward[adj]):                        est_dist = math.sqrt((current_point[0] - destination_point[0]) ** 2 + (current_point[1] - destination_point[1]) ** 2)                        priority = current_dist + est_dist                        boxes[adj] = "visited"                        heappush(queue, (priority, adj, curr_goal))                        distances_forward[adj] = pathcost                        points_forward[adj] = on_point                        parent_forward[adj] = current_box                else:                    if (adj not in parent_backward) or (pathcost < distances_backward[adj]):                        est_dist = math.sqrt((current_point[0] - source_point[0]) ** 2 + (current_point[1] - source_point[1]) ** 2)                        priority = current_dist + est_dist                        boxes[adj] = "visited"                        heappush(queue, (priority, adj, curr_goal))                        distances_backward[adj] = pathcost                        points_backward[adj] = on_point                        parent_backward[adj] = current_box    # print("source point:", source_point)    # print("destination point: ", destination_point)    # print('found solution: ', boxes)    # if sourceBox == destinationBox:    #     path = [source_point, destination_point]    #     boxes[destinationBox] = 'visted'    #     return path, boxes.keys()    #path points and distance calc    # distance = {}    # current_point = destination_point    # for box in boxes:    #     if boxes[box] is None:    #         # we are at the origin    #         break    #     next_box = boxes[box]    #     dx1, dx2, dy1, dy2 = next_box    #     cx1, cx2, cy1, cy2 = box    #     line = []  # (x1, x2, y1, y2)    #     if cx1 == dx2:  # top    #         if (dy2 - dy1) < (cy2 - cy1):  # destination is smaller    #             line = [dx2, dx2, dy1, dy2]    #         else:  # current is smaller    #             line = [cx1, cx1, cy1, cy2]    #     elif cy1 == dy2:  # left    #         if (dx2 - dx1) < (cx2 - cx1):  # destination is smaller    #             line = [dx1,  dx2, dy2, dy2]    #         else:  # current is smaller    #             line = [cx1, cx2, cy1, cy1]    #     elif cx2 == dx1:  # bottom    #         if (dy2 - dy1) < (cy2 - cy1):  # destination is smaller    #             line = [dx1, dx1, dy1, dy2]    #         else:  # current is smaller    #             line = [cx2, cx2, cy1, cy2]    #     elif cy2 == dy1:  # right    #         if (dx2 - dx1) < (cx2 - cx1): # destination is smaller    #             line = [dx1, dx2, dy1, dy1]    #         else:  # current is smaller    #             line = [cx1, cx2, cy2, cy2]    #    #             # print(line)    #     # calculate the line to L, R and mid    #     left_most = (line[0], line[2])    #     right_most = (line[1], line[3])    #     on_point = ()    #     if right_most[0] - left_most[0] == 0: # x2 - x1 , horizontal    #         if current_point[1] < left_most[1]: # y < y1    #             on_point = left_most    #         elif current_point[1] > right_most[1]:    #             on_point = right_most    #         else:    #             on_point = (right_most[0], current_point[1])    #     else:    #         if current_point[0] < left_most[0]: # x < x1    #             on_point = left_most    #         elif current_point[0] > right_most[0]:    #             on_point = right_most    #         else:    #             on_point = (current_point[0], right_most[1])    #     points[box] = on_point    #     path.append(on_point)    #     print(current_point, on_point)    #     dist = math.sqrt((current_point[0] - on_point[0])**2 + (current_point[1] - on_point[1])**2)  # calculates the distance    #     distance[box] = dist    #     print(dist)    #     current_point # x,y coord in current box    """    Searches for a path from source_point to destination_point through the mesh    Args:        source_point: starting point of the pathfinder        destination_point: the ultimate goal the pathfinder must reach        mesh: pathway constraints the path adheres to    Returns:        A path (list of points) from source_point to destination_point if exists        A list of boxes explored by the algorithm    """    path = list(dict.fromkeys(path))    if len(path) == 0:        print("No path")    else:        print("path", path)    if len(path) == 2:        boxes[destinationBox] = "visited"    print("s point: ", source_point)    print("d point: ", destination_point)    return path, boxes.keys()
\ No newline at end of file
+from heapq import heappop, heappush
+import math
+
+from p2_meshindex import mesh_locator
+
+
+def portal(box, neighbor):
+    """ Returns the region shared by two touching boxes, as ((x_low, y_low), (x_high, y_high)).
+
+    For boxes sharing an edge this is the segment of the edge they have in common, and for boxes touching only
+    at a corner it is that corner.
+
+    """
+    return ((max(box[0], neighbor[0]), max(box[2], neighbor[2])),
+            (min(box[1], neighbor[1]), min(box[3], neighbor[3])))
+
+
+def border_point(point, box, neighbor):
+    """ Returns the point of the portal between box and neighbor closest to point. """
+    x, y = point
+    x_low, x_high = max(box[0], neighbor[0]), min(box[1], neighbor[1])
+    y_low, y_high = max(box[2], neighbor[2]), min(box[3], neighbor[3])
+    return (x_low if x < x_low else x_high if x > x_high else x,
+            y_low if y < y_low else y_high if y > y_high else y)
+
+
+def distance(a, b):
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+def find_path(source_point, destination_point, mesh, smooth=True):
+    """
+    Searches for a path from source_point to destination_point through the mesh
+
+    Args:
+        source_point: starting point of the pathfinder
+        destination_point: the ultimate goal the pathfinder must reach
+        mesh: pathway constraints the path adheres to
+        smooth: whether to pull the path taut through the boxes it crosses with funnel_path
+
+    If the mesh has a DistanceOracle in mesh['oracle'] (see p2_oracle.attach_oracle), the boxes are read from
+    its tables instead of searched for, and they are also the boxes reported as explored.
+
+    Returns:
+
+        A path (list of points) from source_point to destination_point if exists
+        A list of boxes explored by the algorithm
+    """
+    oracle = mesh.get('oracle')
+    if oracle is not None:
+        box_path, path, visited = oracle_box_path(source_point, destination_point, mesh, oracle)
+    else:
+        box_path, path, visited = find_box_path(source_point, destination_point, mesh)
+
+    if smooth and box_path:
+        path = funnel_path(source_point, destination_point, box_path)
+
+    return path, visited
+
+
+def find_box_path(source_point, destination_point, mesh):
+    """ Searches for the sequence of boxes leading from source_point to destination_point.
+
+    Two A* searches over the boxes run at once, one from each end, and the path is joined where they first meet.
+    Each search tracks the point at which it enters every box, moving from a box's entry point straight to the
+    nearest point on the border with the next box, so the cost of a box is the length of the polyline that
+    actually reaches it.
+
+    Returns:
+        The boxes the path crosses, in order, the polyline through the entry points of those boxes, and the
+        boxes reached by either search. The first two are empty if there is no path.
+
+    """
+    locator = mesh_locator(mesh)
+    source_box = locator.locate(source_point)
+    destination_box = locator.locate(destination_point)
+
+    if source_box is None or destination_box is None:
+        return [], [], []
+
+    if source_box == destination_box:
+        return [source_box], [source_point, destination_point], [source_box]
+
+    # One search runs from each end, each with the cost, entry point and previous box of every box it reached
+    forward = {'goal': destination_point, 'dist': {source_box: 0}, 'points': {source_box: source_point},
+               'prev': {source_box: None}, 'closed': set()}
+    backward = {'goal': source_point, 'dist': {destination_box: 0}, 'points': {destination_box: destination_point},
+                'prev': {destination_box: None}, 'closed': set()}
+    forward['other'], backward['other'] = backward, forward
+
+    visited = {source_box: None, destination_box: None}     # boxes reached by either search, in order
+
+    queue = []
+    heappush(queue, (distance(source_point, destination_point), 0, source_box, 0))
+    heappush(queue, (distance(source_point, destination_point), 0, destination_box, 1))
+    searches = (forward, backward)
+
+    meeting_box = None
+    while queue:
+        _, current_dist, current_box, side = heappop(queue)
+        search = searches[side]
+
+        # entry points depend on the route taken, so a box is expanded at most once rather than reopened
+        if current_box in search['closed']:
+            continue
+        search['closed'].add(current_box)
+
+        if current_box in search['other']['dist']:
+            meeting_box = current_box
+            break
+
+        current_point = search['points'][current_box]
+        for next_box in mesh['adj'][current_box]:
+            if next_box in search['closed']:
+                continue
+
+            next_point = border_point(current_point, current_box, next_box)
+            pathcost = current_dist + distance(current_point, next_point)
+
+            if pathcost < search['dist'].get(next_box, math.inf):
+                search['dist'][next_box] = pathcost
+                search['points'][next_box] = next_point
+                search['prev'][next_box] = current_box
+                visited[next_box] = None
+                heappush(queue, (pathcost + distance(next_point, search['goal']), pathcost, next_box, side))
+
+    if meeting_box is None:
+        return [], [], list(visited)
+
+    box_path, path = _trace(forward, meeting_box)
+    box_path.reverse()
+    path.reverse()
+    backward_boxes, backward_points = _trace(backward, meeting_box)
+    box_path.extend(backward_boxes[1:])
+    path.extend(backward_points)
+
+    # consecutive entry points coincide where the path crosses a box corner
+    path = [point for i, point in enumerate(path) if i == 0 or point != path[i - 1]]
+
+    return box_path, path, list(visited)
+
+
+def oracle_box_path(source_point, destination_point, mesh, oracle):
+    """ Reads the sequence of boxes leading from source_point to destination_point from a DistanceOracle.
+
+    Returns:
+        The same as find_box_path, with the boxes of the route standing for the boxes reached.
+
+    """
+    locator = mesh_locator(mesh)
+    source_box = locator.locate(source_point)
+    destination_box = locator.locate(destination_point)
+
+    box_path = None
+    if source_box is not None and destination_box is not None:
+        box_path = oracle.box_path(source_box, destination_box)
+
+    if box_path is None:
+        return [], [], []
+
+    return box_path, entry_points(source_point, destination_point, box_path), list(box_path)
+
+
+def entry_points(source_point, destination_point, box_path):
+    """ Returns the polyline entering each box of box_path at the border point nearest the previous point. """
+    path = [source_point]
+    for box, next_box in zip(box_path, box_path[1:]):
+        point = border_point(path[-1], box, next_box)
+        if point != path[-1]:
+            path.append(point)
+
+    if path[-1] != destination_point:
+        path.append(destination_point)
+
+    return path
+
+
+def _trace(search, box):
+    boxes = []
+    points = []
+    while box is not None:
+        boxes.append(box)
+        points.append(search['points'][box])
+        box = search['prev'][box]
+    return boxes, points
+
+
+def _triangle_area2(a, b, c):
+    """ Returns twice the signed area of the triangle abc, positive when c lies clockwise of b around a. """
+    return (c[0] - a[0]) * (b[1] - a[1]) - (b[0] - a[0]) * (c[1] - a[1])
+
+
+def _narrows(apex, side, point, sign):
+    """ Returns whether the ray from apex through point lies inside the side of the funnel through side.
+
+    sign is 1 for the right side and -1 for the left. A point collinear with the side is inside it if it lies
+    ahead of the apex along the side, and outside it if it lies behind.
+
+    """
+    area = _triangle_area2(apex, side, point) * sign
+    if area:
+        return area < 0
+    return (point[0] - apex[0]) * (side[0] - apex[0]) + (point[1] - apex[1]) * (side[1] - apex[1]) > 0
+
+
+def funnel_path(source_point, destination_point, box_path):
+    """ Returns the shortest polyline from source_point to destination_point through a sequence of boxes.
+
+    This is the simple stupid funnel algorithm: the portals between consecutive boxes are walked in order while
+    keeping the funnel of straight lines from the current apex through every portal so far. When a portal would
+    close the funnel, the side it crossed becomes a corner of the path and the new apex. It runs in time
+    linear in the number of boxes, apart from restarts after each corner. A portal the apex lies on constrains
+    nothing, so the funnel starts over beyond it. Boxes doubling back along a line, as overlapping boxes can,
+    may still mislead the funnel, so the path returned is never longer than the entry_points polyline.
+
+    Args:
+        source_point: The start of the path, inside box_path[0].
+        destination_point: The end of the path, inside box_path[-1].
+        box_path: The boxes the path must cross, each touching the next, as returned by find_box_path.
+
+    """
+    # orient each portal into (left, right) as seen when moving from one box into the next
+    portals = [(source_point, source_point)]
+    for box, next_box in zip(box_path, box_path[1:]):
+        low, high = portal(box, next_box)
+        center = ((box[0] + box[1]) / 2, (box[2] + box[3]) / 2)
+        portals.append((low, high) if _triangle_area2(center, low, high) > 0 else (high, low))
+    portals.append((destination_point, destination_point))
+
+    path = [source_point]
+    apex = left = right = source_point
+    apex_index = left_index = right_index = 0
+
+    i = 1
+    while i < len(portals):
+        new_left, new_right = portals[i]
+
+        # portals are axis aligned, so the apex lies on one exactly when it lies within its bounds
+        if min(new_left[0], new_right[0]) <= apex[0] <= max(new_left[0], new_right[0]) and \
+                min(new_left[1], new_right[1]) <= apex[1] <= max(new_left[1], new_right[1]):
+            left = right = apex
+            apex_index = left_index = right_index = i
+            i += 1
+            continue
+
+        # narrow the right side of the funnel, or turn around the left side if the new right crosses it
+        if apex == right or _narrows(apex, right, new_right, 1):
+            if apex == right or _narrows(apex, left, new_right, -1):
+                right, right_index = new_right, i
+            else:
+                path.append(left)
+                apex = right = left
+                apex_index = right_index = left_index
+                i = apex_index + 1
+                continue
+
+        # likewise for the left side
+        if apex == left or _narrows(apex, left, new_left, -1):
+            if apex == left or _narrows(apex, right, new_left, 1):
+                left, left_index = new_left, i
+            else:
+                path.append(right)
+                apex = left = right
+                apex_index = left_index = right_index
+                i = apex_index + 1
+                continue
+
+        i += 1
+
+    if path[-1] != destination_point:
+        path.append(destination_point)
+
+    unsmoothed = entry_points(source_point, destination_point, box_path)
+    if _length(unsmoothed) < _length(path):
+        return unsmoothed
+
+    return path
+
+
+def _length(path):
+    return sum(distance(a, b) for a, b in zip(path, path[1:]))